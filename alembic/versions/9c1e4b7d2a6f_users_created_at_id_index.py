@@ -0,0 +1,27 @@
+"""Index users by (created_at, id) for keyset pagination
+
+Revision ID: 9c1e4b7d2a6f
+Revises: 52fb9190a53a
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9c1e4b7d2a6f"
+down_revision: Union[str, Sequence[str], None] = "52fb9190a53a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_users_created_at_id", "users", ["created_at", "id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_users_created_at_id", table_name="users")
@@ -1,24 +1,60 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+import base64
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import Select, or_, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordRequestForm
 
-from api.db.db_postgres import get_session
+from api.db.db_postgres import async_session, get_session
 from api.auth.auth_model import User
-from api.auth.auth_schemes import Token, UserCreate, UserOut
+from api.auth.auth_schemes import (
+    BulkRegisterResponse,
+    BulkUserResult,
+    Principal,
+    Token,
+    UserCreate,
+    UserOut,
+    UserPage,
+)
 from api.auth.auth_service import (
     create_access_token,
-    verify_password,
-    get_password_hash,
+    get_current_active_user,
+    get_current_user,
+    invalidate_principal,
+    oauth2_scheme,
+    password_hasher,
 )
+from api.services.rate_limit import RateLimit, UserRateLimit
 
 # import logging
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+# Maximum rows accepted by one bulk registration request
+BULK_REGISTER_MAX_ROWS = int(os.getenv("BULK_REGISTER_MAX_ROWS", "10000"))
+
+# Per client IP, login and registration spend a bcrypt hash each
+LOGIN_RATE_LIMIT = os.getenv("RATE_LIMIT_LOGIN", "10/minute")
+REGISTER_RATE_LIMIT = os.getenv("RATE_LIMIT_REGISTER", "5/minute")
+# Per user, a bulk registration can spend BULK_REGISTER_MAX_ROWS hashes
+REGISTER_BULK_RATE_LIMIT = os.getenv("RATE_LIMIT_REGISTER_BULK", "2/minute")
+USERS_STREAM_RATE_LIMIT = os.getenv("RATE_LIMIT_USERS_STREAM", "2/minute")
+
 
 # Endpoint for user login and token generation
-@router.post("/token", response_model=Token)
+@router.post(
+    "/token",
+    response_model=Token,
+    dependencies=[Depends(RateLimit("login", LOGIN_RATE_LIMIT))],
+)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     session: AsyncSession = Depends(get_session),
@@ -27,7 +63,9 @@ async def login(
     result = await session.execute(stmt)
     user = result.scalars().first()
 
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await password_hasher.verify(
+        form_data.password, user.hashed_password
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -39,7 +77,12 @@ async def login(
 
 
 # Endpoint for user registration
-@router.post("/register", response_model=UserOut, status_code=201)
+@router.post(
+    "/register",
+    response_model=UserOut,
+    status_code=201,
+    dependencies=[Depends(RateLimit("register", REGISTER_RATE_LIMIT))],
+)
 async def register(user_data: UserCreate, session: AsyncSession = Depends(get_session)):
     # Проверка уникальности
     existing = await session.execute(
@@ -53,7 +96,7 @@ async def register(user_data: UserCreate, session: AsyncSession = Depends(get_se
             detail="Username or email already exists",
         )
 
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await password_hasher.hash(user_data.password)
     new_user = User(
         username=user_data.username,
         email=user_data.email,
@@ -64,17 +107,279 @@ async def register(user_data: UserCreate, session: AsyncSession = Depends(get_se
     session.add(new_user)
     await session.commit()
     await session.refresh(new_user)
+    await invalidate_principal(new_user.username)
 
     return new_user
 
 
-# Endpoint to get all users
-@router.get("/get-users", response_model=list[UserOut])
-async def get_all_users(session: AsyncSession = Depends(get_session)):
-    stmt = select(User)
-    res = await session.execute(stmt)
-    users = res.scalars().all()
-    return [UserOut.model_validate(user) for user in users]
+# Yields the raw JSON lines of an NDJSON request body as they arrive
+async def read_ndjson_lines(request: Request) -> AsyncIterator[bytes]:
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+# Reads a JSON array or NDJSON body into raw rows (None for undecodable lines)
+async def read_bulk_rows(request: Request) -> list[Any]:
+    rows: list[Any] = []
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        async for line in read_ndjson_lines(request):
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                rows.append(None)
+            if len(rows) > BULK_REGISTER_MAX_ROWS:
+                break
+    else:
+        try:
+            rows = json.loads(await request.body())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail="Invalid JSON body") from e
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array")
+
+    if len(rows) > BULK_REGISTER_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {BULK_REGISTER_MAX_ROWS} users per request",
+        )
+    return rows
+
+
+# First validation error of a row as "field: message"
+def validation_message(e: ValidationError) -> str:
+    errors = e.errors()
+    if not errors:
+        return "Invalid row"
+    loc = ".".join(str(part) for part in errors[0]["loc"])
+    return f"{loc}: {errors[0]['msg']}" if loc else errors[0]["msg"]
+
+
+# Endpoint for bulk user registration (JSON array or application/x-ndjson body).
+# Uniqueness is checked with one query, passwords are hashed in parallel and
+# rows are written with multi-row INSERT ... ON CONFLICT DO NOTHING.
+# Only for authenticated users, within a per-user rate limit.
+@router.post(
+    "/register/bulk",
+    response_model=BulkRegisterResponse,
+    dependencies=[Depends(UserRateLimit("register_bulk", REGISTER_BULK_RATE_LIMIT))],
+)
+async def register_bulk(
+    request: Request,
+    session: AsyncSession = Depends(get_session),
+    current_user: Principal = Depends(get_current_active_user),
+):
+    rows = await read_bulk_rows(request)
+    results: list[BulkUserResult] = []
+    accepted: list[tuple[int, UserCreate]] = []
+    usernames: set[str] = set()
+    emails: set[str] = set()
+
+    for index, row in enumerate(rows):
+        try:
+            user_data = UserCreate.model_validate(row)
+        except ValidationError as e:
+            username = row.get("username") if isinstance(row, dict) else None
+            results.append(
+                BulkUserResult(
+                    index=index,
+                    username=username if isinstance(username, str) else None,
+                    status="error",
+                    error=validation_message(e),
+                )
+            )
+            continue
+        if user_data.username in usernames or user_data.email in emails:
+            results.append(
+                BulkUserResult(
+                    index=index,
+                    username=user_data.username,
+                    status="error",
+                    error="Duplicate username or email in batch",
+                )
+            )
+            continue
+        usernames.add(user_data.username)
+        emails.add(user_data.email)
+        accepted.append((index, user_data))
+
+    # One query for the uniqueness check of the whole batch
+    taken_usernames: set[str] = set()
+    taken_emails: set[str] = set()
+    if accepted:
+        existing = await session.execute(
+            select(User.username, User.email).where(
+                or_(User.username.in_(usernames), User.email.in_(emails))
+            )
+        )
+        for username, email in existing:
+            taken_usernames.add(username)
+            taken_emails.add(email)
+        # End the read transaction: the connection goes back to the pool instead
+        # of idling in a transaction through the bcrypt pass below
+        await session.rollback()
+
+    new_users: list[tuple[int, UserCreate]] = []
+    for index, user_data in accepted:
+        if user_data.username in taken_usernames or user_data.email in taken_emails:
+            results.append(
+                BulkUserResult(
+                    index=index,
+                    username=user_data.username,
+                    status="error",
+                    error="Username or email already exists",
+                )
+            )
+        else:
+            new_users.append((index, user_data))
+
+    hashes = await password_hasher.hash_many([u.password for _, u in new_users])
+    values = [
+        {
+            "id": str(uuid.uuid4()),
+            "username": user_data.username,
+            "email": user_data.email,
+            "full_name": user_data.full_name,
+            "hashed_password": hashed_password,
+            "is_active": True,
+        }
+        for (_, user_data), hashed_password in zip(new_users, hashes)
+    ]
+
+    inserted: set[str] = set()
+    if values:
+        # Rows that lost a race with a concurrent registration are skipped
+        res = await session.execute(
+            insert(User).on_conflict_do_nothing().returning(User.username), values
+        )
+        inserted = set(res.scalars().all())
+        await session.commit()
+
+    for (index, user_data), row in zip(new_users, values):
+        if user_data.username in inserted:
+            results.append(
+                BulkUserResult(
+                    index=index,
+                    username=user_data.username,
+                    status="created",
+                    id=row["id"],
+                )
+            )
+        else:
+            results.append(
+                BulkUserResult(
+                    index=index,
+                    username=user_data.username,
+                    status="error",
+                    error="Username or email already exists",
+                )
+            )
+
+    results.sort(key=lambda result: result.index)
+    created = sum(1 for result in results if result.status == "created")
+    return BulkRegisterResponse(
+        created=created, failed=len(results) - created, results=results
+    )
+
+
+# Rows streamed per server-side cursor fetch
+USERS_STREAM_BATCH = 500
+
+
+# Opaque keyset cursor: the (created_at, id) of the last row of a page
+def encode_users_cursor(created_at: datetime, user_id: str) -> str:
+    raw = json.dumps([created_at.isoformat(), user_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_users_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        created_at, user_id = json.loads(base64.urlsafe_b64decode(cursor))
+        return datetime.fromisoformat(created_at), user_id
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+
+
+# Users ordered by (created_at, id), starting after the cursor
+def users_after(cursor: str | None) -> Select:
+    stmt = select(
+        User.id,
+        User.username,
+        User.email,
+        User.full_name,
+        User.is_active,
+        User.created_at,
+    ).order_by(User.created_at, User.id)
+    if cursor:
+        stmt = stmt.where(
+            tuple_(User.created_at, User.id) > decode_users_cursor(cursor)
+        )
+    return stmt
+
+
+# Writes one JSON object per line as rows arrive from a server-side cursor
+async def stream_users(stmt: Select):
+    # Own session: the request-scoped one may be closed before streaming ends
+    async with async_session() as session:
+        result = await session.stream(
+            stmt.execution_options(yield_per=USERS_STREAM_BATCH)
+        )
+        async for row in result:
+            yield UserOut.model_validate(row).model_dump_json() + "\n"
+
+
+users_stream_rate_limit = RateLimit("users_stream", USERS_STREAM_RATE_LIMIT)
+
+
+# The NDJSON stream dumps the whole table, emails included: only for
+# authenticated users, within a per-user rate limit
+async def authorize_users_stream(
+    request: Request,
+    format: Literal["json", "ndjson"] = Query(
+        "json", description="ndjson streams every user after the cursor"
+    ),
+):
+    if format != "ndjson":
+        return
+    user = await get_current_active_user(
+        await get_current_user(await oauth2_scheme(request))
+    )
+    await users_stream_rate_limit.check(f"user:{user.username}")
+
+
+# Endpoint to get users, a page at a time or streamed as NDJSON
+@router.get(
+    "/get-users",
+    response_model=UserPage,
+    dependencies=[Depends(authorize_users_stream)],
+)
+async def get_all_users(
+    limit: int = Query(100, ge=1, le=1000, description="Page size (json format)"),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
+    format: Literal["json", "ndjson"] = Query(
+        "json", description="ndjson streams every user after the cursor"
+    ),
+    session: AsyncSession = Depends(get_session),
+):
+    stmt = users_after(cursor)
+    if format == "ndjson":
+        return StreamingResponse(stream_users(stmt), media_type="application/x-ndjson")
+
+    res = await session.execute(stmt.limit(limit + 1))
+    rows = res.all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_users_cursor(rows[-1].created_at, rows[-1].id)
+    return UserPage(
+        items=[UserOut.model_validate(row) for row in rows], next_cursor=next_cursor
+    )
 
 
 # Endpoint to get a user by ID
@@ -1,5 +1,5 @@
 from api.db.db_postgres import Base
-from sqlalchemy import String, Boolean, DateTime
+from sqlalchemy import String, Boolean, DateTime, Index
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -9,6 +9,8 @@ import uuid
 # User model
 class User(Base):
     __tablename__ = "users"
+    # Keyset pagination order of /auth/get-users
+    __table_args__ = (Index("ix_users_created_at_id", "created_at", "id"),)
 
     id: Mapped[str] = mapped_column(
         String(36), primary_key=True, default=lambda: str(uuid.uuid4())
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from typing import Literal, Optional
 from datetime import datetime
 
 
@@ -24,6 +24,38 @@ class UserOut(BaseModel):
         from_attributes = True
 
 
+# Pydantic model for one page of users, pass next_cursor back to get the next page
+class UserPage(BaseModel):
+    items: list[UserOut]
+    next_cursor: Optional[str] = None
+
+
+# Pydantic model for the outcome of one row of a bulk registration
+class BulkUserResult(BaseModel):
+    index: int
+    username: Optional[str] = None
+    status: Literal["created", "error"]
+    id: Optional[str] = None
+    error: Optional[str] = None
+
+
+# Pydantic model for a bulk registration response
+class BulkRegisterResponse(BaseModel):
+    created: int
+    failed: int
+    results: list[BulkUserResult]
+
+
+# Pydantic model for the authenticated principal (only what authorization needs)
+class Principal(BaseModel):
+    id: str
+    username: str
+    is_active: bool
+
+    class Config:
+        from_attributes = True
+
+
 # Pydantic model for token data
 class TokenData(BaseModel):
     username: str | None = None
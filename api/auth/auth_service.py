@@ -1,5 +1,7 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Annotated
+from typing import Annotated, Any, Callable
+import asyncio
 import os
 import logging
 
@@ -12,9 +14,12 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from dotenv import load_dotenv
 
-from api.db.db_postgres import get_session
-from api.auth.auth_schemes import TokenData
+from api.db.db_postgres import async_session
+from api.db.redis import redis_client
+from api.auth.auth_schemes import Principal, TokenData
 from api.auth.auth_model import User
+from api.auth.token_cache import VerifiedTokenCache
+from api.metrics import password_hash_duration
 
 load_dotenv(override=True)
 
@@ -26,6 +31,13 @@ if not SECRET_KEY:
     raise RuntimeError("SECRET_KEY_FOR_JWT not set")
 ALGORITHM = "HS256"  # Algorithm used for encoding the JWT
 ACCESS_TOKEN_EXPIRE_MINUTES = 30  # Token expiration time in minutes
+PRINCIPAL_CACHE_TTL = int(
+    os.getenv("PRINCIPAL_CACHE_TTL", "30")
+)  # Seconds an authenticated principal is cached, 0 disables the cache
+
+JWT_CACHE_SIZE = int(
+    os.getenv("JWT_CACHE_SIZE", "10000")
+)  # Verified tokens kept to skip repeated signature checks, 0 disables the cache
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")  # scheme for OAuth2
@@ -34,17 +46,91 @@ pwd_context = CryptContext(
     schemes=["bcrypt"], deprecated="auto"
 )  # Password hashing context
 
+PASSWORD_HASH_WORKERS = int(
+    os.getenv("PASSWORD_HASH_WORKERS", "4")
+)  # Threads running bcrypt off the event loop
+PASSWORD_HASH_QUEUE = int(
+    os.getenv("PASSWORD_HASH_QUEUE", "64")
+)  # Jobs allowed to wait for a thread before requests are rejected with 503
+
 # ------------------------------------------------------------------------------
 
 
 # Hashing the password
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    with password_hash_duration.labels("hash").time():
+        return pwd_context.hash(password)
 
 
 # Verifying the password
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    with password_hash_duration.labels("verify").time():
+        return pwd_context.verify(plain_password, hashed_password)
+
+
+# Runs bcrypt on a size-limited thread pool so it never blocks the event loop.
+# bcrypt releases the GIL, so the threads hash in parallel. Jobs beyond
+# workers + max_queue fail fast with 503 instead of piling up.
+class PasswordHasher:
+    def __init__(
+        self, workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_QUEUE
+    ):
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hash"
+        )
+        self.workers = workers
+        self.capacity = workers + max_queue
+        self.in_flight = 0
+        self._bulk_slots = asyncio.Semaphore(workers)
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self.in_flight >= self.capacity:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication is overloaded, try again later",
+                headers={"Retry-After": "1"},
+            )
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self.in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self.run(get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self.run(verify_password, plain_password, hashed_password)
+
+    # Hash a whole batch in parallel. Instead of failing fast, bulk jobs share
+    # `workers` slots across all batches and count as in flight while they run,
+    # so interactive logins queue behind at most `workers` bulk hashes and
+    # still get the 503 when the hasher is really overloaded.
+    async def hash_many(self, passwords: list[str]) -> list[str]:
+        loop = asyncio.get_running_loop()
+
+        async def hash_one(password: str) -> str:
+            async with self._bulk_slots:
+                self.in_flight += 1
+                try:
+                    return await loop.run_in_executor(
+                        self._executor, get_password_hash, password
+                    )
+                finally:
+                    self.in_flight -= 1
+
+        return await asyncio.gather(*(hash_one(p) for p in passwords))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Singleton hasher used by the auth endpoints
+password_hasher = PasswordHasher()
+
+# Singleton cache of verified token payloads
+token_cache = VerifiedTokenCache(max_size=JWT_CACHE_SIZE)
 
 
 # Creating JWT token
@@ -65,18 +151,50 @@ async def get_user_from_db(session: AsyncSession, username: str) -> User | None:
     return res.scalars().first()
 
 
+def _principal_key(username: str) -> str:
+    return f"principal:{username}"
+
+
+# Fetching the principal from cache (L1/Redis), falling back to the DB.
+# A DB session is only opened on a cache miss.
+async def get_principal(username: str) -> Principal | None:
+    if PRINCIPAL_CACHE_TTL > 0:
+        cached = await redis_client.get_json(_principal_key(username))
+        if cached:
+            return Principal.model_construct(**cached)
+
+    async with async_session() as session:
+        user = await get_user_from_db(session, username)
+    if user is None:
+        return None
+
+    principal = Principal.model_validate(user)
+    if PRINCIPAL_CACHE_TTL > 0:
+        await redis_client.cache_json(
+            _principal_key(username), principal.model_dump(), ttl=PRINCIPAL_CACHE_TTL
+        )
+    return principal
+
+
+# Dropping a cached principal, call whenever a user is created, changed or removed
+async def invalidate_principal(username: str):
+    await redis_client.delete(_principal_key(username))
+
+
 # Getting current user from token
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
-    session: AsyncSession = Depends(get_session),
-) -> User:
+) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = token_cache.get(token)
+        if payload is None:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            token_cache.put(token, payload)
         username: str | None = payload.get("sub")
         if username is None:
             raise credentials_exception
@@ -84,7 +202,7 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    user = await get_user_from_db(session, token_data.username)
+    user = await get_principal(token_data.username)
     if user is None:
         raise credentials_exception
     return user
@@ -92,8 +210,8 @@ async def get_current_user(
 
 # Ensuring the user is active
 async def get_current_active_user(
-    current_user: Annotated[User, Depends(get_current_user)],
-) -> User:
+    current_user: Annotated[Principal, Depends(get_current_user)],
+) -> Principal:
     # Используем поле is_active из модели
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
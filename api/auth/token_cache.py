@@ -0,0 +1,61 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+# Bounded LRU of already verified JWT payloads, keyed by a SHA-256 digest of the
+# token so raw tokens are never kept in memory. Every entry remembers the
+# token's exp and is dropped once it passes, so expired tokens are re-checked
+# (and rejected) by the JWT library.
+class VerifiedTokenCache:
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._data: OrderedDict[bytes, tuple[dict, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._digest(token)
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        payload, exp = item
+        if time.time() >= exp:
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return payload
+
+    # Only tokens with a numeric exp are cached
+    def put(self, token: str, payload: dict):
+        exp = payload.get("exp")
+        if self.max_size <= 0 or not isinstance(exp, (int, float)):
+            return
+        key = self._digest(token)
+        self._data[key] = (payload, float(exp))
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._data),
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
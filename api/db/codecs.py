@@ -0,0 +1,158 @@
+import json
+from typing import Any, Callable
+
+# Values written by PayloadCodec start with this byte, followed by one byte for
+# the codec id and one for the compression id. Plain JSON never starts with
+# NUL, so values written before the header existed are still readable.
+HEADER_MAGIC = 0x00
+HEADER_SIZE = 3
+
+
+# Serializer turning cached objects into bytes and back
+class Codec:
+    def __init__(
+        self,
+        name: str,
+        codec_id: int,
+        dumps: Callable[[Any], bytes],
+        loads: Callable[[bytes], Any],
+    ):
+        self.name = name
+        self.id = codec_id
+        self.dumps = dumps
+        self.loads = loads
+
+
+# Byte-level compression applied after serialization
+class Compressor:
+    def __init__(
+        self,
+        name: str,
+        compressor_id: int,
+        compress: Callable[[bytes], bytes],
+        decompress: Callable[[bytes], bytes],
+    ):
+        self.name = name
+        self.id = compressor_id
+        self.compress = compress
+        self.decompress = decompress
+
+
+def _json_codec() -> Codec:
+    return Codec(
+        "json",
+        1,
+        lambda obj: json.dumps(obj, separators=(",", ":")).encode(),
+        json.loads,
+    )
+
+
+def _orjson_codec() -> Codec:
+    import orjson
+
+    return Codec("orjson", 2, orjson.dumps, orjson.loads)
+
+
+def _msgpack_codec() -> Codec:
+    import msgpack
+
+    return Codec(
+        "msgpack",
+        3,
+        lambda obj: msgpack.packb(obj, use_bin_type=True),
+        lambda data: msgpack.unpackb(data, raw=False),
+    )
+
+
+def _zstd_compressor() -> Compressor:
+    import zstandard
+
+    compressor = zstandard.ZstdCompressor(level=3)
+    decompressor = zstandard.ZstdDecompressor()
+    return Compressor("zstd", 1, compressor.compress, decompressor.decompress)
+
+
+def _lz4_compressor() -> Compressor:
+    import lz4.frame
+
+    return Compressor("lz4", 2, lz4.frame.compress, lz4.frame.decompress)
+
+
+# Factories by name (configuration) and by id (stored header).
+# orjson, msgpack, zstandard and lz4 are optional and only imported when used.
+CODECS: dict[str, Callable[[], Codec]] = {
+    "json": _json_codec,
+    "orjson": _orjson_codec,
+    "msgpack": _msgpack_codec,
+}
+COMPRESSORS: dict[str, Callable[[], Compressor]] = {
+    "zstd": _zstd_compressor,
+    "lz4": _lz4_compressor,
+}
+CODEC_IDS = {1: "json", 2: "orjson", 3: "msgpack"}
+COMPRESSOR_IDS = {1: "zstd", 2: "lz4"}
+
+
+def _load(factories: dict, name: str, kind: str):
+    if name not in factories:
+        raise ValueError(f"Unknown cache {kind}: {name}")
+    try:
+        return factories[name]()
+    except ImportError as e:
+        raise RuntimeError(f"Cache {kind} '{name}' needs a missing package: {e}")
+
+
+# Encodes cached values with the configured codec, compressing payloads of at
+# least min_size bytes. Decoding follows the stored header, so the codec can
+# be changed without flushing Redis.
+class PayloadCodec:
+    def __init__(
+        self, codec: str = "json", compression: str = "none", min_size: int = 1024
+    ):
+        self.codec = _load(CODECS, codec, "codec")
+        self.compressor = None
+        if compression != "none":
+            self.compressor = _load(COMPRESSORS, compression, "compression")
+        self.min_size = min_size
+        self._codecs: dict[int, Codec] = {self.codec.id: self.codec}
+        self._compressors: dict[int, Compressor] = {}
+        if self.compressor:
+            self._compressors[self.compressor.id] = self.compressor
+
+    def encode(self, obj: Any) -> bytes:
+        body = self.codec.dumps(obj)
+        compressor_id = 0
+        if self.compressor and len(body) >= self.min_size:
+            compressed = self.compressor.compress(body)
+            if len(compressed) < len(body):
+                body = compressed
+                compressor_id = self.compressor.id
+        return bytes((HEADER_MAGIC, self.codec.id, compressor_id)) + body
+
+    def decode(self, data: bytes | str) -> Any:
+        if isinstance(data, str):
+            data = data.encode()
+        if not data or data[0] != HEADER_MAGIC:
+            return json.loads(data)
+
+        codec_id, compressor_id = data[1], data[2]
+        body = data[HEADER_SIZE:]
+        if compressor_id:
+            body = self._compressor(compressor_id).decompress(body)
+        return self._codec(codec_id).loads(body)
+
+    def _codec(self, codec_id: int) -> Codec:
+        if codec_id not in self._codecs:
+            if codec_id not in CODEC_IDS:
+                raise ValueError(f"Unknown cache codec id: {codec_id}")
+            self._codecs[codec_id] = _load(CODECS, CODEC_IDS[codec_id], "codec")
+        return self._codecs[codec_id]
+
+    def _compressor(self, compressor_id: int) -> Compressor:
+        if compressor_id not in self._compressors:
+            if compressor_id not in COMPRESSOR_IDS:
+                raise ValueError(f"Unknown cache compression id: {compressor_id}")
+            self._compressors[compressor_id] = _load(
+                COMPRESSORS, COMPRESSOR_IDS[compressor_id], "compression"
+            )
+        return self._compressors[compressor_id]
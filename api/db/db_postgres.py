@@ -3,6 +3,8 @@ from dotenv import load_dotenv
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+from api.metrics import TimedAsyncPool
+
 load_dotenv(override=True)
 
 # --------------------------------------------------------------
@@ -14,14 +16,20 @@ DB_HOST = os.getenv("DB_HOST")
 DB_PORT = os.getenv("DB_PORT")
 DB_NAME = os.getenv("DB_NAME")
 
-DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@db:{DB_PORT}/{DB_NAME}"
+# DATABASE_URL overrides the Postgres settings above (e.g. SQLite for benchmarks)
+DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@db:{DB_PORT}/{DB_NAME}",
+)
+DB_ECHO = os.getenv("DB_ECHO", "true") == "true"  # Log every SQL statement
 
 # ----------------------------------------------------------------
 
 # SQLAlchemy setup
 Base = declarative_base()
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+# The pool records how long sessions wait for a connection
+engine = create_async_engine(DATABASE_URL, echo=DB_ECHO, poolclass=TimedAsyncPool)
 async_session = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
 
 
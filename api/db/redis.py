@@ -1,14 +1,166 @@
 import redis.asyncio as aio_redis
+import asyncio
+import hashlib
 import json
-from typing import Optional, Any
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional, Any
 import os
 from dotenv import load_dotenv
 
+from api.db.codecs import PayloadCodec
+from api.metrics import cache_operations, redis_pool_connections
+
 load_dotenv()
 
+# Deletes the lock key only if it still holds the caller's token
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# Marker of the envelope cache_json wraps values in
+ENVELOPE_KEY = "__cache__"
+
+
+# Cached value with its freshness: stale entries are past the soft TTL
+# but still before the hard TTL (the Redis expiry). content_hash and
+# stored_at are unknown (None, 0) for values written before they existed.
+@dataclass
+class CacheEntry:
+    value: Any
+    stale: bool
+    soft_expires_at: float
+    expires_at: float
+    content_hash: Optional[str] = None
+    stored_at: float = 0
+
+
+# Unwrap a stored value, plain JSON written before envelopes is treated as fresh
+def _to_entry(raw: Any) -> CacheEntry:
+    if isinstance(raw, dict) and raw.get(ENVELOPE_KEY) == 1:
+        soft_exp = raw["soft_exp"]
+        return CacheEntry(
+            value=raw["value"],
+            stale=time.time() >= soft_exp,
+            soft_expires_at=soft_exp,
+            expires_at=raw["hard_exp"],
+            content_hash=raw.get("hash"),
+            stored_at=raw.get("at", 0),
+        )
+    return CacheEntry(value=raw, stale=False, soft_expires_at=0, expires_at=0)
+
+
+# Hash of a value independent of the codec it is stored with, used as its ETag
+def content_hash(data: Any) -> str:
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+
+# Wrap a value with its soft/hard expiry timestamps, write time and content hash
+def _envelope(data: Any, ttl: int, soft_ttl: int | None) -> dict:
+    now = time.time()
+    return {
+        ENVELOPE_KEY: 1,
+        "value": data,
+        "soft_exp": now + min(soft_ttl if soft_ttl is not None else ttl, ttl),
+        "hard_exp": now + ttl,
+        "at": now,
+        "hash": content_hash(data),
+    }
+
+
+# Hard expiry of a stored value, 0 when unknown (plain JSON without envelope)
+def _hard_expiry(raw: Any) -> float:
+    if isinstance(raw, dict) and raw.get(ENVELOPE_KEY) == 1:
+        return raw["hard_exp"]
+    return 0
+
+
+# Bounded in-process TTL + LRU map used as an L1 tier in front of Redis.
+# Values are shared between callers and must be treated as read-only.
+class LocalCache:
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        max_bytes: int = 32 * 1024 * 1024,
+        ttl: float = 5.0,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[Any, float, int]] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        value, expires_at, _ = item
+        if time.monotonic() >= expires_at:
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    # size is the encoded size of the value, used for the memory cap
+    def set(self, key: str, value: Any, size: int, expires_at: float = 0):
+        if size > self.max_bytes:
+            self.invalidate(key)
+            return
+        ttl = self.ttl
+        if expires_at:
+            ttl = min(ttl, expires_at - time.time())
+        if ttl <= 0:
+            self.invalidate(key)
+            return
+
+        self._remove(key)
+        self._data[key] = (value, time.monotonic() + ttl, size)
+        self._bytes += size
+        while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, key: str):
+        self._remove(key)
+
+    def clear(self):
+        self._data.clear()
+        self._bytes = 0
+
+    def _remove(self, key: str):
+        item = self._data.pop(key, None)
+        if item is not None:
+            self._bytes -= item[2]
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._data),
+            "bytes": self._bytes,
+        }
+
 
 # Redis client for asynchronous operations
 class RedisClient:
+    # Channel used to tell other workers to drop keys from their L1 cache
+    INVALIDATION_CHANNEL = "cache:invalidate"
+
     def __init__(
         self,
         host: str = os.getenv("REDIS_HOST"),
@@ -16,41 +168,138 @@ class RedisClient:
         db: int = 0,
         password: str = os.getenv("REDIS_PASSWORD"),
         decode_responses: bool = True,
+        l1_enabled: bool = os.getenv("REDIS_L1_ENABLED", "false") == "true",
+        l1_max_entries: int = int(os.getenv("REDIS_L1_MAX_ENTRIES", "10000")),
+        l1_max_bytes: int = int(os.getenv("REDIS_L1_MAX_BYTES", str(32 * 1024 * 1024))),
+        l1_ttl: float = float(os.getenv("REDIS_L1_TTL", "5")),
+        max_connections: int = int(os.getenv("REDIS_MAX_CONNECTIONS", "50")),
+        pool_timeout: float = float(os.getenv("REDIS_POOL_TIMEOUT", "2")),
+        codec: str = os.getenv("REDIS_CODEC", "json"),
+        compression: str = os.getenv("REDIS_COMPRESSION", "none"),
+        compression_min_bytes: int = int(
+            os.getenv("REDIS_COMPRESSION_MIN_BYTES", "1024")
+        ),
+        pool_metrics_interval: float = float(
+            os.getenv("REDIS_POOL_METRICS_INTERVAL", "5")
+        ),
     ):
         self.host = host
         self.port = port
         self.db = db
         self.password = password
+        # The connection itself returns bytes so cached payloads can be binary,
+        # get() decodes plain string values when decode_responses is set
         self.decode_responses = decode_responses
+        self.codec = PayloadCodec(codec, compression, compression_min_bytes)
+        # Callers wait up to pool_timeout for one of max_connections instead of
+        # opening unbounded connections during a traffic spike
+        self.max_connections = max_connections
+        self.pool_timeout = pool_timeout
+        self.pool: Optional[aio_redis.BlockingConnectionPool] = None
         self.connection: Optional[aio_redis.Redis] = None
+        self._connect_lock = asyncio.Lock()
+        self.pool_metrics_interval = pool_metrics_interval
+        self._pool_metrics_task: Optional[asyncio.Task] = None
 
-    # Connect to Redis
+        # Optional in-process L1 tier, kept coherent through pub/sub invalidations.
+        # Its TTL also bounds staleness while the invalidation listener reconnects.
+        self.l1: Optional[LocalCache] = None
+        if l1_enabled:
+            self.l1 = LocalCache(l1_max_entries, l1_max_bytes, l1_ttl)
+        self._instance_id = uuid.uuid4().hex
+        self._invalidation_task: Optional[asyncio.Task] = None
+
+    # Connect to Redis, concurrent first callers share one connection attempt
     async def connect(self):
-        if not self.connection:
+        if self.connection:
+            return self.connection
+        async with self._connect_lock:
+            if self.connection:
+                return self.connection
             try:
-                self.connection = aio_redis.Redis(
+                pool = aio_redis.BlockingConnectionPool(
                     host=self.host,
                     port=self.port,
                     db=self.db,
                     password=self.password,
-                    decode_responses=self.decode_responses,
+                    max_connections=self.max_connections,
+                    timeout=self.pool_timeout,
                 )
-                await self.connection.ping()
+                connection = aio_redis.Redis(connection_pool=pool)
+                await connection.ping()
             except Exception as e:
                 raise ConnectionError(f"Failed to connect to Redis: {e}")
+            self.pool = pool
+            self.connection = connection
+            if self.l1 is not None and self._invalidation_task is None:
+                self._invalidation_task = asyncio.create_task(
+                    self._listen_invalidations()
+                )
         return self.connection
 
     # Disconnect from Redis
     async def disconnect(self):
+        if self._invalidation_task:
+            self._invalidation_task.cancel()
+            self._invalidation_task = None
+        if self.l1 is not None:
+            self.l1.clear()
         if self.connection:
             await self.connection.aclose()
+            if self.pool is not None:
+                await self.pool.disconnect()
             self.connection = None
+            self.pool = None
+
+    # Connection pool usage, for monitoring (GET /status/redis and the
+    # redis_pool_connections gauge), from the pool's public connection counts
+    def pool_stats(self) -> dict:
+        stats = {"max_connections": self.max_connections, "in_use": 0, "idle": 0}
+        if self.pool is not None and hasattr(self.pool, "get_connection_count"):
+            for count, attributes in self.pool.get_connection_count():
+                state = attributes.get("db.client.connection.state")
+                stats["in_use" if state == "used" else "idle"] += count
+        return stats
+
+    # Every worker samples its own pool into the redis_pool_connections gauge
+    # on a timer, so the sum over workers is current whichever one is scraped
+    def start_pool_metrics(self):
+        if self._pool_metrics_task is None and self.pool_metrics_interval > 0:
+            self._pool_metrics_task = asyncio.create_task(self._sample_pool())
+
+    def stop_pool_metrics(self):
+        if self._pool_metrics_task is not None:
+            self._pool_metrics_task.cancel()
+            self._pool_metrics_task = None
+
+    def record_pool_stats(self):
+        stats = self.pool_stats()
+        for state in ("in_use", "idle"):
+            redis_pool_connections.labels(state).set(stats[state])
+
+    async def _sample_pool(self):
+        while True:
+            self.record_pool_stats()
+            await asyncio.sleep(self.pool_metrics_interval)
+
+    # Queue several commands and send them in one round trip. Commands left
+    # queued when the block exits are executed automatically.
+    @asynccontextmanager
+    async def pipeline(self, transaction: bool = False) -> AsyncIterator[Any]:
+        redis = await self.connect()
+        async with redis.pipeline(transaction=transaction) as pipe:
+            yield pipe
+            if len(pipe):
+                await pipe.execute()
 
     # Get a value by key
     async def get(self, key: str) -> Any:
         try:
             redis = await self.connect()
-            return await redis.get(key)
+            value = await redis.get(key)
+            if self.decode_responses and isinstance(value, bytes):
+                return value.decode()
+            return value
         except Exception as e:
             print(f"Error getting key from Redis: {e}")
             return None
@@ -64,28 +313,197 @@ class RedisClient:
     async def delete(self, key: str) -> Any | None:
         try:
             redis = await self.connect()
-            return await redis.delete(key)
+            deleted = await redis.delete(key)
+            await self._invalidate(key)
+            return deleted
         except Exception as e:
             print(f"Error deleting key from Redis: {e}")
 
-    # Cache JSON data with a TTL (time to live)
-    async def cache_json(self, key: str, data: dict, ttl: int = 300):
+    # Cache JSON data with a TTL (time to live).
+    # ttl is the hard TTL after which the key is gone, soft_ttl (<= ttl) marks
+    # the point after which readers get the value flagged as stale.
+    # Returns the entry as readers will see it, even if writing it failed.
+    async def cache_json(
+        self, key: str, data: dict, ttl: int = 300, soft_ttl: int | None = None
+    ) -> CacheEntry:
+        envelope = _envelope(data, ttl, soft_ttl)
         try:
             redis = await self.connect()
-            await redis.set(key, json.dumps(data), ex=ttl)
+            payload = self.codec.encode(envelope)
+            await redis.set(key, payload, ex=ttl)
+            await self._invalidate(key)
+            if self.l1 is not None:
+                self.l1.set(key, envelope, len(payload), envelope["hard_exp"])
+            cache_operations.labels("set", "ok").inc()
+        except Exception as e:
+            cache_operations.labels("set", "error").inc()
+            print(f"Error caching JSON to Redis: {e}")
+        return _to_entry(envelope)
+
+    # Cache several JSON values in one pipelined round trip. ttl is either one
+    # TTL for every key or a per-key mapping (keys missing from it get 300 s).
+    # Returns the entries by key, like cache_json.
+    async def mset_json(
+        self,
+        items: dict[str, Any],
+        ttl: int | dict[str, int] = 300,
+        soft_ttl: int | None = None,
+    ) -> dict[str, CacheEntry]:
+        if not items:
+            return {}
+        ttls = {
+            key: ttl.get(key, 300) if isinstance(ttl, dict) else ttl for key in items
+        }
+        envelopes = {
+            key: _envelope(data, ttls[key], soft_ttl) for key, data in items.items()
+        }
+        try:
+            sizes = {}
+            async with self.pipeline() as pipe:
+                for key, envelope in envelopes.items():
+                    payload = self.codec.encode(envelope)
+                    sizes[key] = len(payload)
+                    pipe.set(key, payload, ex=ttls[key])
+                    if self.l1 is not None:
+                        pipe.publish(
+                            self.INVALIDATION_CHANNEL, f"{self._instance_id}:{key}"
+                        )
+            if self.l1 is not None:
+                for key, envelope in envelopes.items():
+                    self.l1.set(key, envelope, sizes[key], envelope["hard_exp"])
+            cache_operations.labels("set", "ok").inc(len(items))
         except Exception as e:
+            cache_operations.labels("set", "error").inc(len(items))
             print(f"Error caching JSON to Redis: {e}")
+        return {key: _to_entry(envelope) for key, envelope in envelopes.items()}
 
-    # Retrieve JSON data by key
+    # Retrieve JSON data by key, stale or not
     async def get_json(self, key: str) -> Optional[dict]:
+        entry = await self.get_json_entry(key)
+        return entry.value if entry else None
+
+    # Retrieve JSON data by key together with its freshness
+    async def get_json_entry(self, key: str) -> Optional[CacheEntry]:
+        if self.l1 is not None:
+            raw = self.l1.get(key)
+            if raw is not None:
+                cache_operations.labels("get", "l1_hit").inc()
+                return _to_entry(raw)
         try:
             redis = await self.connect()
             data = await redis.get(key)
-            return json.loads(data) if data else None
+            if not data:
+                cache_operations.labels("get", "miss").inc()
+                return None
+            raw = self.codec.decode(data)
+            if self.l1 is not None:
+                self.l1.set(key, raw, len(data), _hard_expiry(raw))
+            cache_operations.labels("get", "hit").inc()
+            return _to_entry(raw)
         except Exception as e:
+            cache_operations.labels("get", "error").inc()
             print(f"Error retrieving JSON from Redis: {e}")
             return None
 
+    # Retrieve several JSON values in one round trip, missing keys map to None
+    async def mget_json(self, keys: list[str]) -> list[Optional[dict]]:
+        entries = await self.mget_json_entries(keys)
+        return [entry.value if entry else None for entry in entries]
+
+    # Retrieve several JSON entries with one MGET for everything not in L1
+    async def mget_json_entries(self, keys: list[str]) -> list[Optional[CacheEntry]]:
+        entries: list[Optional[CacheEntry]] = [None] * len(keys)
+        pending = []
+        for i, key in enumerate(keys):
+            raw = self.l1.get(key) if self.l1 is not None else None
+            if raw is not None:
+                entries[i] = _to_entry(raw)
+            else:
+                pending.append(i)
+        if len(pending) < len(keys):
+            cache_operations.labels("get", "l1_hit").inc(len(keys) - len(pending))
+        if not pending:
+            return entries
+
+        try:
+            redis = await self.connect()
+            values = await redis.mget([keys[i] for i in pending])
+            hits = 0
+            for i, data in zip(pending, values):
+                if not data:
+                    continue
+                raw = self.codec.decode(data)
+                if self.l1 is not None:
+                    self.l1.set(keys[i], raw, len(data), _hard_expiry(raw))
+                entries[i] = _to_entry(raw)
+                hits += 1
+            cache_operations.labels("get", "hit").inc(hits)
+            cache_operations.labels("get", "miss").inc(len(pending) - hits)
+        except Exception as e:
+            cache_operations.labels("get", "error").inc(len(pending))
+            print(f"Error retrieving JSON from Redis: {e}")
+        return entries
+
+    # Try to acquire a short-lived lock, returns the owner token on success
+    async def acquire_lock(self, key: str, ttl_ms: int = 5000) -> Optional[str]:
+        redis = await self.connect()
+        token = uuid.uuid4().hex
+        if await redis.set(key, token, nx=True, px=ttl_ms):
+            return token
+        return None
+
+    # Release a lock previously acquired with acquire_lock
+    async def release_lock(self, key: str, token: str) -> bool:
+        try:
+            redis = await self.connect()
+            return bool(await redis.eval(RELEASE_LOCK_SCRIPT, 1, key, token))
+        except Exception as e:
+            print(f"Error releasing lock in Redis: {e}")
+            return False
+
+    # Run a Lua script atomically, errors are left to the caller
+    async def eval(self, script: str, keys: list[str], args: list[Any]) -> Any:
+        redis = await self.connect()
+        return await redis.eval(script, len(keys), *keys, *args)
+
+    # Drop a key from the local L1 and tell the other workers to do the same
+    async def _invalidate(self, key: str):
+        if self.l1 is None:
+            return
+        self.l1.invalidate(key)
+        await self.connection.publish(
+            self.INVALIDATION_CHANNEL, f"{self._instance_id}:{key}"
+        )
+
+    # Background listener evicting keys changed by other workers
+    async def _listen_invalidations(self):
+        while True:
+            pubsub = self.connection.pubsub()
+            try:
+                await pubsub.subscribe(self.INVALIDATION_CHANNEL)
+                # Messages may have been missed while we were not subscribed
+                self.l1.clear()
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    data = message["data"]
+                    if isinstance(data, bytes):
+                        data = data.decode()
+                    sender, _, key = data.partition(":")
+                    if sender != self._instance_id:
+                        self.l1.invalidate(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error in Redis invalidation listener: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    # Hit/miss/eviction counters of the L1 tier
+    def l1_stats(self) -> Optional[dict]:
+        return self.l1.stats() if self.l1 is not None else None
+
 
 # Singleton instance of RedisClient
 redis_client = RedisClient()
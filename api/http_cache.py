@@ -0,0 +1,97 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import time
+from email.utils import formatdate
+from typing import Any, Optional
+
+from dotenv import load_dotenv
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+from api.db.redis import CacheEntry
+
+try:
+    import orjson
+except ImportError:  # in requirements.txt, the stdlib encoder is only a fallback
+    orjson = None
+
+load_dotenv(override=True)
+
+if orjson is None:
+    logging.getLogger(__name__).warning(
+        "orjson is not installed, responses are encoded with the slower json module"
+    )
+
+# Send ETag, Last-Modified and Cache-Control with cached responses, answer
+# matching If-None-Match requests with 304
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "true") == "true"
+
+
+# JSON response for plain, already validated data: encoded with orjson and
+# without FastAPI's jsonable_encoder pass
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content)
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+# Validators of a response built from cache entries: the ETag is the entries'
+# content hash, max-age the time left until the first of them goes stale and
+# Last-Modified the time the newest was written. Weak ETags are for responses
+# that add per-request parts to the cached values (like the crypto status
+# block). None when an entry predates content hashes.
+def cache_headers(
+    entries: list[CacheEntry], weak: bool = False, extra: str = ""
+) -> Optional[dict[str, str]]:
+    if not entries or any(entry.content_hash is None for entry in entries):
+        return None
+    if len(entries) == 1 and not extra:
+        tag = entries[0].content_hash
+    else:
+        parts = [extra, *(entry.content_hash for entry in entries)]
+        tag = hashlib.blake2b("|".join(parts).encode(), digest_size=16).hexdigest()
+    max_age = max(0, math.floor(min(e.soft_expires_at for e in entries) - time.time()))
+    return {
+        "ETag": f'W/"{tag}"' if weak else f'"{tag}"',
+        "Last-Modified": formatdate(max(e.stored_at for e in entries), usegmt=True),
+        "Cache-Control": f"private, max-age={max_age}",
+    }
+
+
+# If-None-Match uses the weak comparison: W/"x" and "x" match
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+# JSON response carrying the validators of its cache entries, or an empty 304
+# when the client already has this version (the body is never serialized then).
+# Headers dependencies set on the route's injected `response` (RateLimit-*) are
+# copied over, FastAPI only merges them into responses it builds itself.
+def cached_json_response(
+    request: Request,
+    content: Any,
+    entries: list[CacheEntry],
+    weak: bool = False,
+    extra: str = "",
+    response: Optional[Response] = None,
+) -> Response:
+    headers = cache_headers(entries, weak, extra) if HTTP_CACHE_ENABLED else None
+    if headers is not None and etag_matches(request, headers["ETag"]):
+        result = Response(status_code=304, headers=headers)
+    else:
+        result = FastJSONResponse(content, headers=headers)
+    if response is not None:
+        for name, value in response.headers.items():
+            if name not in ("content-length", "content-type"):
+                result.headers.append(name, value)
+    return result
@@ -0,0 +1,102 @@
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# With several uvicorn workers set PROMETHEUS_MULTIPROC_DIR to an empty
+# directory shared by them (wiped before start): every process writes its
+# samples there and /metrics aggregates them, whichever worker serves it.
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Buckets tuned for fast cache hits up to slow upstream calls
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+cache_operations = Counter(
+    "cache_operations_total",
+    "Cache reads (l1_hit, hit, miss, error) and writes (ok, error)",
+    ["operation", "result"],
+)
+
+upstream_request_duration = Histogram(
+    "upstream_request_duration_seconds",
+    "Latency of each upstream attempt by response status ('error' for network errors)",
+    ["upstream", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+db_pool_checkout_duration = Histogram(
+    "db_pool_checkout_seconds",
+    "Time spent waiting for a database connection from the pool",
+    buckets=LATENCY_BUCKETS,
+)
+
+password_hash_duration = Histogram(
+    "password_hash_seconds",
+    "bcrypt time of password hashing and verification",
+    ["operation"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0),
+)
+
+# Sampled by every worker on a timer (REDIS_POOL_METRICS_INTERVAL). With several
+# workers the live ones are summed; a worker's samples are dropped on shutdown.
+redis_pool_connections = Gauge(
+    "redis_pool_connections",
+    "Connections of the Redis pool by state (in_use, idle)",
+    ["state"],
+    multiprocess_mode="livesum",
+)
+
+
+# Queue pool of the async engine that also records how long checkouts wait
+class TimedAsyncPool(AsyncAdaptedQueuePool):
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_checkout_duration.observe(time.perf_counter() - start)
+
+
+# Drop this worker's live gauge samples, called on shutdown
+def mark_process_dead():
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+# Exposition of all metrics, aggregated over workers in multiprocess mode
+def render_metrics() -> tuple[bytes, str]:
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
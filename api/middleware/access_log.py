@@ -0,0 +1,146 @@
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import time
+
+from dotenv import load_dotenv
+
+from api.metrics import http_request_duration
+
+load_dotenv(override=True)
+
+logger = logging.getLogger("api.access")
+
+# Share of requests written to the access log; errors and slow requests always are
+ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "1"))
+ACCESS_LOG_SLOW_MS = float(os.getenv("ACCESS_LOG_SLOW_MS", "1000"))
+# Also log request headers (sensitive ones redacted)
+ACCESS_LOG_HEADERS = os.getenv("ACCESS_LOG_HEADERS", "false") == "true"
+
+REDACTED_HEADERS = {
+    b"authorization",
+    b"proxy-authorization",
+    b"cookie",
+    b"set-cookie",
+    b"x-api-key",
+    b"x-cmc_pro_api_key",
+}
+
+
+# Formats and writes log records on a background thread. Request handlers only
+# put records on a queue, so slow stderr/file I/O never blocks the event loop.
+class QueueLogging:
+    def __init__(self, level: int = logging.INFO):
+        self.level = level
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.listener: logging.handlers.QueueListener | None = None
+
+    def start(self):
+        if self.listener is not None:
+            return
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+        root = logging.getLogger()
+        root.setLevel(self.level)
+        root.handlers = [logging.handlers.QueueHandler(self.queue)]
+        self.listener = logging.handlers.QueueListener(
+            self.queue, handler, respect_handler_level=True
+        )
+        self.listener.start()
+
+    # Flushes records still queued
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+
+# Header list of an ASGI scope with sensitive values replaced
+def redact_headers(headers: list[tuple[bytes, bytes]]) -> dict[str, str]:
+    return {
+        name.decode("latin-1"): (
+            "[redacted]"
+            if name.lower() in REDACTED_HEADERS
+            else value.decode("latin-1")
+        )
+        for name, value in headers
+    }
+
+
+# Pure ASGI access log: times each request with perf_counter_ns, records it in
+# the latency histogram of its route and logs a sample of them. Unlike
+# @app.middleware("http") it doesn't wrap the response in a streaming proxy, it
+# only watches the status passing through `send`.
+class AccessLogMiddleware:
+    def __init__(
+        self,
+        app,
+        sample_rate: float = ACCESS_LOG_SAMPLE_RATE,
+        slow_ms: float = ACCESS_LOG_SLOW_MS,
+        log_headers: bool = ACCESS_LOG_HEADERS,
+    ):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.log_headers = log_headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter_ns()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration_ms = (time.perf_counter_ns() - start) / 1_000_000
+            # Route template (not the raw path) keeps the label set bounded
+            route = scope.get("route")
+            http_request_duration.labels(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                status_code,
+            ).observe(duration_ms / 1000)
+            if (
+                status_code >= 500
+                or duration_ms >= self.slow_ms
+                or random.random() < self.sample_rate
+            ):
+                self.log(scope, status_code, duration_ms)
+
+    def log(self, scope, status_code: int, duration_ms: float):
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        client = scope.get("client")
+        path = scope["path"]
+        if scope.get("query_string"):
+            path = f"{path}?{scope['query_string'].decode('latin-1')}"
+        if self.log_headers:
+            logger.info(
+                '%s "%s %s" %d %.2fms headers=%s',
+                client[0] if client else "-",
+                scope["method"],
+                path,
+                status_code,
+                duration_ms,
+                redact_headers(scope["headers"]),
+            )
+        else:
+            logger.info(
+                '%s "%s %s" %d %.2fms',
+                client[0] if client else "-",
+                scope["method"],
+                path,
+                status_code,
+                duration_ms,
+            )
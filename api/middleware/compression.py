@@ -0,0 +1,108 @@
+import gzip
+import os
+from typing import Optional
+
+from dotenv import load_dotenv
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional, responses fall back to gzip
+    brotli = None
+
+load_dotenv(override=True)
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true") == "true"
+# Smaller bodies aren't worth the CPU, they barely shrink
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+
+# Fast settings: responses are compressed per request, not once ahead of time
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+
+# Preferred encoding the client accepts: br over gzip, q=0 rules one out
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for encoding in ("br", "gzip") if brotli is not None else ("gzip",):
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(encoding: str, body: bytes) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+# Compresses complete response bodies of at least minimum_size bytes with
+# brotli or gzip. Streaming responses (Server-Sent Events, anything sent in
+# several chunks) and already encoded bodies are passed through as they are.
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app,
+        minimum_size: int = COMPRESSION_MIN_BYTES,
+        enabled: bool = COMPRESSION_ENABLED,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        encoding = None
+        if scope["type"] == "http" and self.enabled:
+            encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        # The start message is held back until the body shows whether to compress
+        pending_start = None
+
+        async def send_compressed(message):
+            nonlocal pending_start
+            if message["type"] == "http.response.start":
+                content_type = Headers(raw=message["headers"]).get("content-type", "")
+                if not content_type.startswith("text/event-stream"):
+                    pending_start = message
+                    return
+            if message["type"] != "http.response.body" or pending_start is None:
+                await send(message)
+                return
+
+            start, pending_start = pending_start, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start["headers"])
+            if (
+                message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or "content-encoding" in headers
+            ):
+                await send(start)
+                await send(message)
+                return
+
+            body = compress(encoding, body)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            # A strong ETag names the uncompressed bytes
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,119 @@
+import asyncio
+import os
+from typing import Any, Awaitable
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from api.auth.auth_service import get_current_active_user
+from api.auth.auth_schemes import Principal
+from api.services.coinmarketcap import crypto_service
+from api.services.rate_limit import UserRateLimit
+from api.services.weatherService import weather_client
+
+# Fan-out limits of one aggregate request
+AGGREGATE_MAX_CONCURRENCY = int(os.getenv("AGGREGATE_MAX_CONCURRENCY", "10"))
+AGGREGATE_MAX_ITEMS = int(os.getenv("AGGREGATE_MAX_ITEMS", "50"))
+AGGREGATE_WEATHER_DEADLINE = float(os.getenv("AGGREGATE_WEATHER_DEADLINE", "3"))
+AGGREGATE_CRYPTO_DEADLINE = float(os.getenv("AGGREGATE_CRYPTO_DEADLINE", "3"))
+AGGREGATE_RATE_LIMIT = os.getenv("RATE_LIMIT_AGGREGATE", "10/minute")
+
+router = APIRouter(prefix="/aggregate", tags=["aggregate"])
+
+
+# Await one item within its source deadline, turning failures into an error entry
+async def run_item(
+    source: str, item: str, call: Awaitable[Any], deadline: float
+) -> tuple[Any, dict | None]:
+    try:
+        return await asyncio.wait_for(call, timeout=deadline), None
+    except asyncio.TimeoutError:
+        error = {"status": 504, "detail": f"No answer within {deadline} s"}
+    except HTTPException as e:
+        error = {"status": e.status_code, "detail": e.detail}
+    except Exception as e:
+        error = {"status": 502, "detail": str(e)}
+    return None, {"source": source, "item": item, **error}
+
+
+# Endpoint to fetch weather for several cities and quotes for several symbols
+# concurrently. Returns whatever finished in time plus per-item errors.
+@router.get(
+    "/", dependencies=[Depends(UserRateLimit("aggregate", AGGREGATE_RATE_LIMIT))]
+)
+async def aggregate(
+    cities: list[str] = Query([], description="City, repeat the parameter for more"),
+    symbols: list[str] = Query([], description="Symbols, repeated or comma-separated"),
+    convert: str = "USD",
+    user: Principal = Depends(get_current_active_user),
+):
+    symbols = crypto_service.parse_symbols(",".join(symbols))
+    cities = list(dict.fromkeys(c.strip() for c in cities if c.strip()))
+    if len(cities) + len(symbols) > AGGREGATE_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {AGGREGATE_MAX_ITEMS} items per request"
+        )
+
+    slots = asyncio.Semaphore(AGGREGATE_MAX_CONCURRENCY)
+
+    async def weather(city: str):
+        async with slots:
+            return await weather_client.current_weather(city)
+
+    # All symbols go in one call: one MGET for cached ones, one upstream request for the rest
+    async def crypto(names: list[str]) -> dict:
+        async with slots:
+            response = await crypto_service.get_cryptocurrencies(
+                ",".join(names), convert=convert
+            )
+        return response.get("data") or {}
+
+    weather_tasks = [
+        run_item("weather", city, weather(city), AGGREGATE_WEATHER_DEADLINE)
+        for city in cities
+    ]
+    crypto_task = (
+        run_item(
+            "crypto", ",".join(symbols), crypto(symbols), AGGREGATE_CRYPTO_DEADLINE
+        )
+        if symbols
+        else None
+    )
+    results = await asyncio.gather(
+        *weather_tasks, *([crypto_task] if crypto_task else [])
+    )
+
+    response: dict[str, Any] = {"weather": {}, "crypto": {}, "errors": []}
+    for city, (value, error) in zip(cities, results):
+        if error:
+            response["errors"].append(error)
+        else:
+            response["weather"][city] = value.get("data")
+
+    if crypto_task:
+        value, error = results[-1]
+        if error and error["status"] == 400 and len(symbols) > 1:
+            # CoinMarketCap rejects the whole call for one invalid symbol, ask
+            # for each on its own so only the invalid ones report an error
+            per_symbol = await asyncio.gather(
+                *(
+                    run_item("crypto", s, crypto([s]), AGGREGATE_CRYPTO_DEADLINE)
+                    for s in symbols
+                )
+            )
+        else:
+            per_symbol = [(value, error)] * len(symbols)
+        for symbol, (quotes, error) in zip(symbols, per_symbol):
+            if error:
+                response["errors"].append({**error, "item": symbol})
+            elif symbol in quotes:
+                response["crypto"][symbol] = quotes[symbol]
+            else:
+                response["errors"].append(
+                    {
+                        "source": "crypto",
+                        "item": symbol,
+                        "status": 404,
+                        "detail": "Symbol not found",
+                    }
+                )
+    return response
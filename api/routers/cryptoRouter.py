@@ -1,11 +1,19 @@
-from fastapi import APIRouter, Depends
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 
 from api.services.coinmarketcap import CryptoCurrencyService
 from api.auth.auth_service import (
     get_current_active_user,
 )  # to protect the endpoint with auth (JWT)
-from api.auth.auth_model import User
+from api.auth.auth_schemes import Principal
 from api.services.coinmarketcap import crypto_service
+from api.services.crypto_schemes import parse_fields, project
+from api.services.rate_limit import UserRateLimit
+from api.http_cache import cached_json_response
+
+CRYPTO_RATE_LIMIT = os.getenv("RATE_LIMIT_CRYPTO", "30/minute")
 
 router = APIRouter(
     prefix="/crypto",
@@ -13,11 +21,35 @@ router = APIRouter(
 )
 
 
-# Endpoint to get cryptocurrency data
-@router.get("/")
+# Endpoint to get cryptocurrency data, fields=price,percent_change_24h limits
+# every quote to the given fields
+@router.get("/", dependencies=[Depends(UserRateLimit("crypto", CRYPTO_RATE_LIMIT))])
 async def get_crypto(
     currency: str,
+    request: Request,
+    response: Response,
     convert: str = "USD",
-    current_user: User = Depends(get_current_active_user),
+    fields: Optional[str] = None,
+    current_user: Principal = Depends(get_current_active_user),
 ):
-    return await crypto_service.get_cryptocurrencies(crypto=currency, convert=convert)
+    try:
+        projection = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    quotes, entries = await crypto_service.get_cryptocurrency_entries(
+        crypto=currency, convert=convert
+    )
+    if projection is not None:
+        quotes["data"] = {
+            symbol: project(quote, projection)
+            for symbol, quote in quotes["data"].items()
+        }
+    # The status block differs per response, so the ETag only covers the quotes
+    return cached_json_response(
+        request,
+        quotes,
+        entries,
+        weak=True,
+        extra=f"{quotes['status'].get('notice')}|{projection}",
+        response=response,
+    )
@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Response
+
+from api.metrics import render_metrics
+
+router = APIRouter(tags=["status"])
+
+
+# Prometheus scrape endpoint
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
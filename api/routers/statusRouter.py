@@ -0,0 +1,50 @@
+from fastapi import APIRouter
+
+from api.auth.auth_service import token_cache
+from api.db.redis import redis_client
+from api.services.credits import credit_schedulers
+from api.services.prefetch import prefetcher
+from api.services.quote_stream import quote_stream
+from api.services.resilience import upstreams
+
+router = APIRouter(prefix="/status", tags=["status"])
+
+
+# Endpoint to inspect circuit breaker and retry state of every upstream
+@router.get("/upstreams")
+async def get_upstreams():
+    return {name: upstream.snapshot() for name, upstream in upstreams.items()}
+
+
+# Endpoint to inspect remaining upstream credits and calls queued for them
+@router.get("/credits")
+async def get_credits():
+    return {
+        name: await scheduler.snapshot()
+        for name, scheduler in credit_schedulers.items()
+    }
+
+
+# Endpoint to inspect the prefetch scheduler and the most popular keys
+@router.get("/prefetch")
+async def get_prefetch():
+    return await prefetcher.snapshot()
+
+
+# Endpoint to inspect streaming connections and topics of this worker
+@router.get("/stream")
+async def get_stream():
+    return quote_stream.stats()
+
+
+# Endpoint to inspect the Redis connection pool and the L1 cache tier (null
+# when disabled) of this worker
+@router.get("/redis")
+async def get_redis():
+    return {**redis_client.pool_stats(), "l1": redis_client.l1_stats()}
+
+
+# Endpoint to inspect the verified JWT cache of this worker (hits, misses, size)
+@router.get("/token-cache")
+async def get_token_cache():
+    return token_cache.stats()
@@ -0,0 +1,138 @@
+import asyncio
+import json
+import os
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Request,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.responses import StreamingResponse
+
+from api.auth.auth_schemes import Principal
+from api.auth.auth_service import get_current_active_user, get_current_user
+from api.services.coinmarketcap import crypto_service
+from api.services.quote_stream import Subscription, quote_stream
+from api.services.rate_limit import UserRateLimit
+
+# Seconds between keep-alive comments on idle event streams
+STREAM_KEEPALIVE = float(os.getenv("STREAM_KEEPALIVE", "15"))
+# Seconds a new WebSocket has to send its auth message
+STREAM_AUTH_TIMEOUT = float(os.getenv("STREAM_AUTH_TIMEOUT", "10"))
+STREAM_RATE_LIMIT = os.getenv("RATE_LIMIT_STREAM", "10/minute")
+
+router = APIRouter(prefix="/stream", tags=["stream"])
+
+# Shared by SSE and WebSocket connections
+stream_rate_limit = UserRateLimit("stream", STREAM_RATE_LIMIT)
+
+
+# Server-Sent Events: one `quote` event per update of the given symbols.
+# The token is checked once, when the stream is opened.
+@router.get("/quotes", dependencies=[Depends(stream_rate_limit)])
+async def stream_quotes(
+    request: Request,
+    symbols: str,
+    convert: str = "USD",
+    user: Principal = Depends(get_current_active_user),
+):
+    sub = Subscription()
+    try:
+        await quote_stream.subscribe(
+            sub, crypto_service.parse_symbols(symbols), convert
+        )
+    except ValueError as e:
+        quote_stream.close(sub)
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                message = await sub.get(timeout=STREAM_KEEPALIVE)
+                if message is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield f"event: quote\ndata: {message}\n\n"
+        finally:
+            quote_stream.close(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# The first message of a WebSocket must be {"action": "auth", "token": "<JWT>"}.
+# Tokens aren't taken from the URL, servers log WebSocket paths with their query.
+async def authenticate_ws(websocket: WebSocket) -> Principal:
+    message = json.loads(
+        await asyncio.wait_for(websocket.receive_text(), STREAM_AUTH_TIMEOUT)
+    )
+    if not isinstance(message, dict) or message.get("action") != "auth":
+        raise ValueError("Expected an auth message")
+    user = await get_current_active_user(
+        await get_current_user(str(message.get("token") or ""))
+    )
+    await stream_rate_limit.check(f"user:{user.username}")
+    return user
+
+
+# WebSocket: authenticate with {"action": "auth", "token": "<JWT>"} once, then send
+# {"action": "subscribe" | "unsubscribe", "symbols": [...], "convert": "USD"}.
+# Quote updates arrive as {"symbol", "convert", "data"} messages.
+@router.websocket("/ws")
+async def stream_ws(websocket: WebSocket):
+    await websocket.accept()
+    try:
+        await authenticate_ws(websocket)
+    except HTTPException as e:
+        reason = "Too many connections" if e.status_code == 429 else str(e.detail)
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=reason)
+        return
+    except (ValueError, asyncio.TimeoutError):
+        await websocket.close(
+            code=status.WS_1008_POLICY_VIOLATION, reason="Authentication required"
+        )
+        return
+    except WebSocketDisconnect:
+        return
+    await websocket.send_json({"status": "authenticated"})
+
+    sub = Subscription()
+
+    async def receive():
+        while True:
+            try:
+                request = json.loads(await websocket.receive_text())
+                action = request.get("action")
+                symbols = request.get("symbols") or []
+                if isinstance(symbols, str):
+                    symbols = crypto_service.parse_symbols(symbols)
+                convert = request.get("convert") or "USD"
+                if action == "subscribe":
+                    await quote_stream.subscribe(sub, symbols, convert)
+                elif action == "unsubscribe":
+                    quote_stream.unsubscribe(sub, symbols, convert)
+                else:
+                    raise ValueError("action must be subscribe or unsubscribe")
+            except (ValueError, AttributeError) as e:
+                await websocket.send_json({"error": str(e)})
+
+    async def send():
+        while True:
+            await websocket.send_text(await sub.queue.get())
+
+    # Runs until the client disconnects (or sending fails)
+    tasks = [asyncio.create_task(receive()), asyncio.create_task(send())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        quote_stream.close(sub)
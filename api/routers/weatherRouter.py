@@ -1,14 +1,26 @@
-from fastapi import APIRouter
-from api.services.weatherService import WeatherClient
+import os
+
+from fastapi import APIRouter, Request, Response
+from api.services.weatherService import weather_client
 from fastapi import Depends
 from api.auth.auth_service import get_current_active_user
-from api.auth.auth_model import User
+from api.auth.auth_schemes import Principal
+from api.services.rate_limit import UserRateLimit
+from api.http_cache import cached_json_response
 
-router = APIRouter(prefix="/weather", tags=["weather"])
+WEATHER_RATE_LIMIT = os.getenv("RATE_LIMIT_WEATHER", "60/minute")
 
-weatherClient = WeatherClient()
+router = APIRouter(prefix="/weather", tags=["weather"])
 
 
-@router.get("/{city}")
-async def get_weather(city: str, user: User = Depends(get_current_active_user)):
-    return await weatherClient.current_weather(city)
+@router.get(
+    "/{city}", dependencies=[Depends(UserRateLimit("weather", WEATHER_RATE_LIMIT))]
+)
+async def get_weather(
+    city: str,
+    request: Request,
+    response: Response,
+    user: Principal = Depends(get_current_active_user),
+):
+    entry = await weather_client.current_weather_entry(city)
+    return cached_json_response(request, entry.value, [entry], response=response)
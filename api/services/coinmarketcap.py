@@ -1,11 +1,106 @@
+import asyncio
+import math
 import httpx
 import os
+from datetime import datetime, timezone
 from dotenv import load_dotenv
-from typing import Dict, Optional
+from typing import Awaitable, Callable, Dict, Optional
 from fastapi import HTTPException
+from pydantic import ValidationError
+
+from api.db.redis import CacheEntry, redis_client
+from api.services.credits import (
+    CreditScheduler,
+    CreditsExhausted,
+    get_credit_scheduler,
+    quote_credits,
+)
+from api.services.crypto_schemes import normalize_quotes
+from api.services.http_clients import http_clients
+from api.services.prefetch import prefetcher
+from api.services.resilience import CircuitOpenError, get_upstream
 
 load_dotenv(override=True)
 
+# Seconds a quote for one (symbol, convert) pair stays fresh, and how long it
+# is kept as a fallback for when CoinMarketCap is unavailable
+CRYPTO_CACHE_TTL = int(os.getenv("CRYPTO_CACHE_TTL", "60"))
+CRYPTO_STALE_TTL = int(os.getenv("CRYPTO_STALE_TTL", "600"))
+
+# Opt-in micro-batching of concurrent lookups, 0 ms disables it
+CMC_BATCH_WINDOW_MS = float(os.getenv("CMC_BATCH_WINDOW_MS", "0"))
+CMC_BATCH_MAX_SYMBOLS = int(os.getenv("CMC_BATCH_MAX_SYMBOLS", "100"))
+
+
+# Symbols waiting to be sent in one upstream call
+class _Batch:
+    def __init__(self):
+        self.symbols: dict[str, None] = {}
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        # Mark the outcome as retrieved even if every waiter went away
+        self.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+# Merges symbol lookups that arrive within `window` seconds (or until
+# `max_symbols` are collected) into a single quotes/latest call per convert
+class QuoteBatcher:
+    def __init__(
+        self,
+        fetch: Callable[[list[str], str], Awaitable[Dict[str, any]]],
+        window: float,
+        max_symbols: int = 100,
+    ):
+        self._fetch = fetch
+        self.window = window
+        self.max_symbols = max_symbols
+        self._pending: Dict[str, _Batch] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    # Returns the raw upstream response of the batch the symbols were sent in
+    async def load(self, symbols: list[str], convert: str) -> Dict[str, any]:
+        batch = self._pending.get(convert)
+        new_symbols = [s for s in symbols if batch is None or s not in batch.symbols]
+        if (
+            batch is not None
+            and len(batch.symbols) + len(new_symbols) > self.max_symbols
+        ):
+            self._flush(convert, batch)
+            batch = None
+
+        if batch is None:
+            batch = _Batch()
+            self._pending[convert] = batch
+            batch.timer = asyncio.get_running_loop().call_later(
+                self.window, self._flush, convert, batch
+            )
+        batch.symbols.update(dict.fromkeys(symbols))
+
+        if len(batch.symbols) >= self.max_symbols:
+            self._flush(convert, batch)
+
+        try:
+            return await asyncio.shield(batch.future)
+        except HTTPException as e:
+            # One caller's invalid symbol rejects the whole batch, retry on our own
+            if e.status_code == 400 and len(batch.symbols) > len(symbols):
+                return await self._fetch(symbols, convert)
+            raise
+
+    def _flush(self, convert: str, batch: _Batch):
+        if self._pending.get(convert) is batch:
+            del self._pending[convert]
+        batch.timer.cancel()
+        task = asyncio.create_task(self._dispatch(convert, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, convert: str, batch: _Batch):
+        try:
+            batch.future.set_result(await self._fetch(list(batch.symbols), convert))
+        except Exception as e:
+            batch.future.set_exception(e)
+
 
 # cryptocurrency service to interact with CoinMarketCap API
 class CryptoCurrencyService:
@@ -13,33 +108,212 @@ class CryptoCurrencyService:
         self,
         api_key: str | None = os.getenv("COINMARKETCAP_API_KEY"),
         timeout: float = 5.0,
+        cache_ttl: int = CRYPTO_CACHE_TTL,
+        stale_ttl: int = CRYPTO_STALE_TTL,
+        batch_window_ms: float = CMC_BATCH_WINDOW_MS,
+        batch_max_symbols: int = CMC_BATCH_MAX_SYMBOLS,
     ):
         self.base_url = "https://pro-api.coinmarketcap.com/v1"
         self.api_key = api_key
         if not self.api_key:
             raise RuntimeError("COINMARKETCAP_API_KEY is not set")
         self.timeout = timeout
-        self._client: Optional[httpx.AsyncClient] = None
+        self.cache_ttl = cache_ttl
+        self.stale_ttl = max(stale_ttl, cache_ttl)
+        self.upstream = get_upstream("coinmarketcap")
+        self.credits = get_credit_scheduler("coinmarketcap")
+        self._batcher: Optional[QuoteBatcher] = None
+        if batch_window_ms > 0:
+            self._batcher = QuoteBatcher(
+                self._fetch_quotes, batch_window_ms / 1000, batch_max_symbols
+            )
 
         self.headers = {
             "Accepts": "application/json",
             "X-CMC_PRO_API_KEY": self.api_key,
         }
+        http_clients.register(
+            "coinmarketcap", self.base_url, timeout=timeout, headers=self.headers
+        )
+        prefetcher.register("crypto", self._prefetch, batch=True)
 
     async def get_client(self) -> httpx.AsyncClient:
-        if self._client is None:
-            self._client = httpx.AsyncClient(timeout=self.timeout, headers=self.headers)
-        return self._client
+        return http_clients.get("coinmarketcap")
+
+    # Normalized quotes are cached per (symbol, convert) pair, so overlapping
+    # requests share entries
+    @staticmethod
+    def cache_key(symbol: str, convert: str) -> str:
+        return f"quote:{symbol}:{convert}"
+
+    # "btc, eth,BTC" -> ["BTC", "ETH"]
+    @staticmethod
+    def parse_symbols(crypto: str) -> list[str]:
+        symbols = (s.strip().upper() for s in crypto.split(","))
+        return list(dict.fromkeys(s for s in symbols if s))
 
+    # Background callers (prefetching) pass priority=CreditScheduler.BACKGROUND
+    # so they queue behind interactive requests for upstream credits
     async def get_cryptocurrencies(
-        self, crypto: str, convert: str = "USD"
+        self,
+        crypto: str,
+        convert: str = "USD",
+        priority: int = CreditScheduler.INTERACTIVE,
     ) -> Dict[str, any]:
-        params = {"symbol": crypto, "convert": convert}
+        response, _ = await self.get_cryptocurrency_entries(crypto, convert, priority)
+        return response
+
+    # Like get_cryptocurrencies, together with the cache entry of every returned
+    # quote, which HTTP validators are built from
+    async def get_cryptocurrency_entries(
+        self,
+        crypto: str,
+        convert: str = "USD",
+        priority: int = CreditScheduler.INTERACTIVE,
+    ) -> tuple[Dict[str, any], list[CacheEntry]]:
+        symbols = self.parse_symbols(crypto)
+        convert = convert.strip().upper()
+        if not symbols:
+            raise HTTPException(status_code=400, detail="No currency symbols given")
+
+        # One MGET for every requested symbol, stale quotes are only a fallback
+        keys = [self.cache_key(symbol, convert) for symbol in symbols]
+        entries = await redis_client.mget_json_entries(keys)
+        served = {}
+        stale = {}
+        for symbol, entry in zip(symbols, entries):
+            if entry is not None:
+                (stale if entry.stale else served)[symbol] = entry
+        quotes = {symbol: entry.value for symbol, entry in served.items()}
+        missing = [symbol for symbol in symbols if symbol not in quotes]
+
+        status = None
+        if missing:
+            try:
+                if (
+                    self._batcher is not None
+                    and priority == CreditScheduler.INTERACTIVE
+                ):
+                    data = await self._batcher.load(missing, convert)
+                else:
+                    data = await self._fetch_quotes(missing, convert, priority)
+            except HTTPException as e:
+                # Upstream unavailable or out of credits: serve the last cached
+                # quotes if we have them all
+                unavailable = e.status_code >= 500 or e.status_code == 429
+                if not unavailable or any(s not in stale for s in missing):
+                    raise
+                served.update({s: stale[s] for s in missing})
+                quotes.update({s: stale[s].value for s in missing})
+                notice = (
+                    "CoinMarketCap credit budget exhausted"
+                    if e.status_code == 429
+                    else "CoinMarketCap unavailable"
+                )
+                status = self._cached_status(
+                    notice=f"{notice}, serving last cached quotes"
+                )
+            else:
+                status = data.get("status")
+                upstream = data.get("data") or {}
+                # A batched response also carries other callers' symbols
+                fetched = {s: upstream[s] for s in missing if s in upstream}
+                stored = await self._store_quotes(fetched, convert)
+                served.update(stored)
+                quotes.update({s: entry.value for s, entry in stored.items()})
+
+        for symbol in quotes:
+            prefetcher.record("crypto", self.cache_key(symbol, convert))
+
+        # CoinMarketCap's status block and the normalized quotes, in the order
+        # symbols were requested
+        returned = [symbol for symbol in symbols if symbol in quotes]
+        response = {
+            "status": status or self._cached_status(),
+            "data": {symbol: quotes[symbol] for symbol in returned},
+        }
+        return response, [served[symbol] for symbol in returned]
+
+    # Normalize and cache upstream quotes per symbol, returns their cache entries
+    async def _store_quotes(
+        self, quotes: Dict[str, any], convert: str
+    ) -> Dict[str, CacheEntry]:
+        try:
+            normalized = normalize_quotes(quotes, convert)
+        except ValidationError as e:
+            raise HTTPException(
+                status_code=502, detail=f"Unexpected CoinMarketCap quote: {e}"
+            ) from e
+        entries = await redis_client.mset_json(
+            {
+                self.cache_key(symbol, convert): quote
+                for symbol, quote in normalized.items()
+            },
+            ttl=self.stale_ttl,
+            soft_ttl=self.cache_ttl,
+        )
+        return {symbol: entries[self.cache_key(symbol, convert)] for symbol in quotes}
+
+    # Re-fetch popular quotes before they go stale, called by the prefetcher.
+    # Symbols are grouped per convert into as few calls as possible, which
+    # queue behind interactive requests for credits.
+    async def _prefetch(self, cache_keys: list[str]):
+        by_convert: Dict[str, list[str]] = {}
+        for key in cache_keys:
+            _, symbol, convert = key.split(":", 2)
+            by_convert.setdefault(convert, []).append(symbol)
+        for convert, symbols in by_convert.items():
+            for i in range(0, len(symbols), 100):
+                chunk = symbols[i : i + 100]
+                data = await self._fetch_quotes(
+                    chunk, convert, CreditScheduler.BACKGROUND
+                )
+                upstream = data.get("data") or {}
+                await self._store_quotes(
+                    {s: upstream[s] for s in chunk if s in upstream}, convert
+                )
+
+    # Status block for responses served from cache
+    @staticmethod
+    def _cached_status(notice: str | None = None) -> Dict[str, any]:
+        return {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "error_code": 0,
+            "error_message": None,
+            "elapsed": 0,
+            "credit_count": 0,
+            "notice": notice,
+        }
+
+    # One upstream call for the given symbols, within the credit budget
+    async def _fetch_quotes(
+        self,
+        symbols: list[str],
+        convert: str,
+        priority: int = CreditScheduler.INTERACTIVE,
+    ) -> Dict[str, any]:
+        params = {"symbol": ",".join(symbols), "convert": convert}
         url = f"{self.base_url}/cryptocurrency/quotes/latest"
 
+        cost = quote_credits(len(symbols))
+        try:
+            await self.credits.acquire(cost, priority)
+        except CreditsExhausted as e:
+            raise HTTPException(
+                status_code=429,
+                detail=str(e),
+                headers={"Retry-After": str(math.ceil(e.retry_after))},
+            ) from e
+
         client = await self.get_client()
         try:
-            resp = await client.get(url, params=params)
+            resp = await self.upstream.call(lambda: client.get(url, params=params))
+        except CircuitOpenError as e:
+            raise HTTPException(
+                status_code=503,
+                detail=str(e),
+                headers={"Retry-After": str(math.ceil(e.retry_after))},
+            ) from e
         except httpx.RequestError as e:
             raise HTTPException(
                 status_code=503, detail=f"Error connecting to CoinMarketCap: {e}"
@@ -52,6 +326,8 @@ class CryptoCurrencyService:
             )
 
         data = resp.json()
+        credit_count = (data.get("status") or {}).get("credit_count") or 0
+        await self.credits.charge(credit_count - cost)
         return data
 
 
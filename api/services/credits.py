@@ -0,0 +1,264 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import os
+from datetime import datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+
+from api.db.redis import redis_client
+
+load_dotenv(override=True)
+
+logger = logging.getLogger(__name__)
+
+# CoinMarketCap plan limits shared by every worker, 0 disables a limit
+CMC_CREDITS_PER_MINUTE = float(os.getenv("CMC_CREDITS_PER_MINUTE", "30"))
+CMC_CREDITS_PER_DAY = int(os.getenv("CMC_CREDITS_PER_DAY", "0"))
+# How long a call may queue for credits before the caller gets stale data instead
+CMC_CREDIT_MAX_WAIT = float(os.getenv("CMC_CREDIT_MAX_WAIT", "1"))
+CMC_BACKGROUND_MAX_WAIT = float(os.getenv("CMC_BACKGROUND_MAX_WAIT", "30"))
+# Share of the per-minute bucket background calls leave for interactive ones
+CMC_BACKGROUND_RESERVE = float(os.getenv("CMC_BACKGROUND_RESERVE", "0.2"))
+
+# Token bucket refilled continuously up to the per-minute limit, plus a daily
+# counter. Uses the Redis clock so every worker sees the same bucket. A forced
+# take always succeeds and may drive the bucket negative (settling extra usage).
+# Returns {allowed, tokens left, ms until cost is available (-1: daily limit), used today}
+TAKE_CREDITS_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local floor = tonumber(ARGV[3])
+local daily_limit = tonumber(ARGV[4])
+local force = ARGV[5] == "1"
+local time = redis.call("TIME")
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local rate = capacity / 60000
+
+local tokens = capacity
+local used = tonumber(redis.call("GET", KEYS[2]) or "0")
+if capacity > 0 then
+    local state = redis.call("HMGET", KEYS[1], "tokens", "ts")
+    tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+end
+
+if not force then
+    if daily_limit > 0 and used + cost > daily_limit then
+        return {0, tostring(tokens), -1, used}
+    end
+    if capacity > 0 and tokens - cost < floor then
+        return {0, tostring(tokens), math.ceil((cost + floor - tokens) / rate), used}
+    end
+end
+
+if capacity > 0 then
+    tokens = tokens - cost
+    redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "ts", now)
+    redis.call("PEXPIRE", KEYS[1], 120000)
+end
+if cost > 0 then
+    used = redis.call("INCRBY", KEYS[2], cost)
+    redis.call("EXPIRE", KEYS[2], 172800)
+end
+return {1, tostring(tokens), 0, used}
+"""
+
+
+# Raised when a call would exceed the credit budget within its wait limit
+class CreditsExhausted(Exception):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Credit budget of {name} is exhausted")
+        self.name = name
+        self.retry_after = retry_after
+
+
+# One call waiting for credits, ordered by priority and then arrival
+class _Waiter:
+    def __init__(self, priority: int, seq: int):
+        self.priority = priority
+        self.seq = seq
+        self.turn = asyncio.Event()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+# Cluster-wide credit budget of a metered upstream. Calls of a worker queue by
+# priority and only the head of the queue takes credits from the shared Redis
+# bucket, so interactive requests overtake background refreshes. Background
+# calls also leave a reserve of the bucket to interactive ones.
+class CreditScheduler:
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+    def __init__(
+        self,
+        name: str,
+        per_minute: float = CMC_CREDITS_PER_MINUTE,
+        per_day: int = CMC_CREDITS_PER_DAY,
+        interactive_wait: float = CMC_CREDIT_MAX_WAIT,
+        background_wait: float = CMC_BACKGROUND_MAX_WAIT,
+        background_reserve: float = CMC_BACKGROUND_RESERVE,
+    ):
+        self.name = name
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.max_wait = {
+            self.INTERACTIVE: interactive_wait,
+            self.BACKGROUND: background_wait,
+        }
+        self.floor = {
+            self.INTERACTIVE: 0.0,
+            self.BACKGROUND: per_minute * background_reserve,
+        }
+        self._queue: list[_Waiter] = []
+        self._seq = itertools.count()
+        # Wait the head of the queue was last told, a hint for callers behind it
+        self._retry_hint = 1.0
+        self.granted = 0
+        self.rejected = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.per_minute > 0 or self.per_day > 0
+
+    def _keys(self) -> list[str]:
+        day = datetime.now(timezone.utc).strftime("%Y%m%d")
+        return [f"credits:{self.name}:bucket", f"credits:{self.name}:day:{day}"]
+
+    async def _take(
+        self, cost: int, floor: float, force: bool = False
+    ) -> tuple[bool, float, float, int]:
+        allowed, tokens, wait_ms, used = await redis_client.eval(
+            TAKE_CREDITS_SCRIPT,
+            self._keys(),
+            [self.per_minute, cost, floor, self.per_day, int(force)],
+        )
+        return bool(allowed), float(tokens), int(wait_ms), int(used)
+
+    # Wait for `cost` credits, raises CreditsExhausted when they won't be
+    # available within the priority's wait limit (or `max_wait` if given)
+    async def acquire(
+        self, cost: int = 1, priority: int = INTERACTIVE, max_wait: float | None = None
+    ):
+        if not self.enabled:
+            return
+        loop = asyncio.get_running_loop()
+        if max_wait is None:
+            max_wait = self.max_wait[priority]
+        deadline = loop.time() + max_wait
+        waiter = _Waiter(priority, next(self._seq))
+        heapq.heappush(self._queue, waiter)
+        self._wake_head()
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if self._queue[0] is not waiter:
+                    waiter.turn.clear()
+                    try:
+                        await asyncio.wait_for(waiter.turn.wait(), max(remaining, 0))
+                    except asyncio.TimeoutError:
+                        self.rejected += 1
+                        raise CreditsExhausted(self.name, self._retry_hint)
+                    continue
+
+                try:
+                    allowed, _, wait_ms, _ = await self._take(
+                        cost, self.floor[priority]
+                    )
+                except Exception as e:
+                    # Without Redis the budget can't be tracked, don't block calls on it
+                    logger.warning("Credit check of %s failed: %s", self.name, e)
+                    return
+                if allowed:
+                    self.granted += 1
+                    return
+                retry_after = self._retry_after(wait_ms)
+                self._retry_hint = retry_after
+                if retry_after > deadline - loop.time():
+                    self.rejected += 1
+                    raise CreditsExhausted(self.name, retry_after)
+                await asyncio.sleep(retry_after)
+        finally:
+            self._queue.remove(waiter)
+            heapq.heapify(self._queue)
+            self._wake_head()
+
+    # Record credits used beyond what was acquired (the upstream reports the real cost)
+    async def charge(self, cost: int):
+        if not self.enabled or cost <= 0:
+            return
+        try:
+            await self._take(cost, 0, force=True)
+        except Exception as e:
+            logger.warning("Credit charge of %s failed: %s", self.name, e)
+
+    def _wake_head(self):
+        if self._queue:
+            self._queue[0].turn.set()
+
+    # Seconds until credits are available, until UTC midnight for the daily limit
+    @staticmethod
+    def _retry_after(wait_ms: int) -> float:
+        if wait_ms >= 0:
+            return wait_ms / 1000
+        now = datetime.now(timezone.utc)
+        midnight = (now + timedelta(days=1)).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        return (midnight - now).total_seconds()
+
+    def queue_depth(self) -> dict:
+        depth = {"interactive": 0, "background": 0}
+        for waiter in self._queue:
+            if waiter.priority == self.INTERACTIVE:
+                depth["interactive"] += 1
+            else:
+                depth["background"] += 1
+        return depth
+
+    # Remaining budget (shared by the cluster) and queue depth (of this worker)
+    async def snapshot(self) -> dict:
+        snapshot = {
+            "enabled": self.enabled,
+            "per_minute": self.per_minute,
+            "per_day": self.per_day or None,
+            "minute_remaining": None,
+            "day_used": None,
+            "day_remaining": None,
+            "queue": self.queue_depth(),
+            "granted": self.granted,
+            "rejected": self.rejected,
+        }
+        if not self.enabled:
+            return snapshot
+        try:
+            _, tokens, _, used = await self._take(0, 0)
+        except Exception as e:
+            logger.warning("Credit check of %s failed: %s", self.name, e)
+            return snapshot
+        if self.per_minute > 0:
+            snapshot["minute_remaining"] = round(tokens, 2)
+        snapshot["day_used"] = used
+        if self.per_day > 0:
+            snapshot["day_remaining"] = max(0, self.per_day - used)
+        return snapshot
+
+
+# Shared schedulers by upstream name
+credit_schedulers: dict[str, CreditScheduler] = {}
+
+
+def get_credit_scheduler(name: str) -> CreditScheduler:
+    if name not in credit_schedulers:
+        credit_schedulers[name] = CreditScheduler(name)
+    return credit_schedulers[name]
+
+
+# CoinMarketCap bills 1 credit per 100 symbols of a quotes call
+def quote_credits(symbols: int) -> int:
+    return max(1, math.ceil(symbols / 100))
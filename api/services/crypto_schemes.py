@@ -0,0 +1,69 @@
+from typing import Any, Optional
+
+from pydantic import BaseModel, TypeAdapter
+
+
+# Pydantic model for one normalized quote: the fields we serve out of a
+# CoinMarketCap quote, flattened for one convert currency
+class CryptoQuote(BaseModel):
+    symbol: str
+    name: Optional[str] = None
+    convert: str
+    price: Optional[float] = None
+    market_cap: Optional[float] = None
+    volume_24h: Optional[float] = None
+    percent_change_1h: Optional[float] = None
+    percent_change_24h: Optional[float] = None
+    percent_change_7d: Optional[float] = None
+    cmc_rank: Optional[int] = None
+    last_updated: Optional[str] = None
+
+
+QUOTE_FIELDS = tuple(CryptoQuote.model_fields)
+
+# Built once, validating a whole upstream response is one call into pydantic-core
+_QUOTES = TypeAdapter(list[CryptoQuote])
+
+
+# CoinMarketCap "data" block -> normalized quotes by symbol, validated once
+# here so they can be cached and served without further checks
+def normalize_quotes(data: dict[str, Any], convert: str) -> dict[str, dict]:
+    flat = []
+    for symbol, quote in data.items():
+        market = (quote.get("quote") or {}).get(convert) or {}
+        flat.append(
+            {
+                "symbol": quote.get("symbol") or symbol,
+                "name": quote.get("name"),
+                "convert": convert,
+                "price": market.get("price"),
+                "market_cap": market.get("market_cap"),
+                "volume_24h": market.get("volume_24h"),
+                "percent_change_1h": market.get("percent_change_1h"),
+                "percent_change_24h": market.get("percent_change_24h"),
+                "percent_change_7d": market.get("percent_change_7d"),
+                "cmc_rank": quote.get("cmc_rank"),
+                "last_updated": market.get("last_updated") or quote.get("last_updated"),
+            }
+        )
+    quotes = _QUOTES.dump_python(_QUOTES.validate_python(flat))
+    return dict(zip(data, quotes))
+
+
+# "price, percent_change_24h" -> ("price", "percent_change_24h"), None for all fields
+def parse_fields(fields: Optional[str]) -> Optional[tuple[str, ...]]:
+    if not fields:
+        return None
+    names = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [name for name in names if name not in QUOTE_FIELDS]
+    if unknown:
+        raise ValueError(
+            f"Unknown fields: {', '.join(unknown)}; known: {', '.join(QUOTE_FIELDS)}"
+        )
+    return names or None
+
+
+def project(quote: dict, fields: Optional[tuple[str, ...]]) -> dict:
+    if fields is None:
+        return quote
+    return {name: quote.get(name) for name in fields}
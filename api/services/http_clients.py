@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Optional
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+logger = logging.getLogger(__name__)
+
+# Connection settings shared by every upstream client
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "true") == "true"
+UPSTREAM_WARMUP = os.getenv("UPSTREAM_WARMUP", "true") == "true"
+
+
+# Settings of one upstream API
+@dataclass
+class UpstreamConfig:
+    base_url: str
+    timeout: float = 5.0
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+# Registry of the shared httpx clients for all upstream APIs. Services register
+# their upstream at construction, the application lifespan opens (and warms up)
+# the clients at startup and closes them on shutdown.
+class UpstreamClients:
+    def __init__(
+        self,
+        max_connections: int = UPSTREAM_MAX_CONNECTIONS,
+        max_keepalive: int = UPSTREAM_MAX_KEEPALIVE,
+        keepalive_expiry: float = UPSTREAM_KEEPALIVE_EXPIRY,
+        http2: bool = UPSTREAM_HTTP2,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("h2 is not installed, upstream clients use HTTP/1.1")
+                self.http2 = False
+        self._configs: dict[str, UpstreamConfig] = {}
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._transports: dict[str, httpx.AsyncBaseTransport] = {}
+
+    def register(
+        self,
+        name: str,
+        base_url: str,
+        timeout: float = 5.0,
+        headers: Optional[dict[str, str]] = None,
+    ):
+        self._configs[name] = UpstreamConfig(base_url, timeout, headers or {})
+
+    # Route an upstream through a custom transport (local stand-ins, benchmarks)
+    def set_transport(self, name: str, transport: httpx.AsyncBaseTransport):
+        self._transports[name] = transport
+        self._clients.pop(name, None)
+
+    # Shared client of an upstream, created on first use outside the app lifespan
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._create(name)
+            self._clients[name] = client
+        return client
+
+    def _create(self, name: str) -> httpx.AsyncClient:
+        config = self._configs[name]
+        transport = self._transports.get(name)
+        return httpx.AsyncClient(
+            timeout=config.timeout,
+            headers=config.headers,
+            limits=self.limits,
+            http2=self.http2 and transport is None,
+            transport=transport,
+        )
+
+    async def startup(self, warmup: bool = UPSTREAM_WARMUP):
+        for name in self._configs:
+            self.get(name)
+        if warmup:
+            await asyncio.gather(*(self._warmup(name) for name in self._configs))
+
+    # Open a connection (DNS, TCP, TLS) so the first request can reuse it
+    async def _warmup(self, name: str):
+        try:
+            await self.get(name).head(self._configs[name].base_url)
+        except httpx.HTTPError as e:
+            logger.warning("Warm-up of upstream %s failed: %s", name, e)
+
+    async def shutdown(self):
+        clients = list(self._clients.values())
+        self._clients.clear()
+        await asyncio.gather(*(client.aclose() for client in clients))
+
+
+# Singleton registry used by all upstream services
+http_clients = UpstreamClients()
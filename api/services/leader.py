@@ -0,0 +1,49 @@
+import logging
+from typing import Optional
+
+from api.db.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Extends the lease only if it is still held with the caller's token
+RENEW_LEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+# Cluster-wide leader election through a Redis lease: whoever holds the key is
+# the leader until it stops renewing it for ttl_ms. Call acquire_or_renew more
+# often than ttl_ms to keep leadership.
+class LeaderLease:
+    def __init__(self, name: str, ttl_ms: int = 15000):
+        self.key = f"leader:{name}"
+        self.ttl_ms = ttl_ms
+        self.token: Optional[str] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self.token is not None
+
+    async def acquire_or_renew(self) -> bool:
+        try:
+            if self.token is not None:
+                renewed = await redis_client.eval(
+                    RENEW_LEASE_SCRIPT, [self.key], [self.token, self.ttl_ms]
+                )
+                if renewed:
+                    return True
+                logger.info("Lost leadership of %s", self.key)
+            self.token = await redis_client.acquire_lock(self.key, self.ttl_ms)
+        except Exception as e:
+            logger.warning("Leader election on %s failed: %s", self.key, e)
+            self.token = None
+        return self.token is not None
+
+    # Hand leadership over right away instead of waiting for the lease to expire
+    async def release(self):
+        if self.token is not None:
+            await redis_client.release_lock(self.key, self.token)
+            self.token = None
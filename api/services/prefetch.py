@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Optional
+
+from dotenv import load_dotenv
+
+from api.db.redis import redis_client
+from api.services.leader import LeaderLease
+
+load_dotenv(override=True)
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true") == "true"
+# Seconds between scheduler cycles (popularity flush, leader renewal, refresh planning)
+PREFETCH_INTERVAL = float(os.getenv("PREFETCH_INTERVAL", "5"))
+# Keys per source kept warm, and how long before their soft TTL they are refreshed
+PREFETCH_TOP_N = int(os.getenv("PREFETCH_TOP_N", "20"))
+PREFETCH_LEAD_SECONDS = float(os.getenv("PREFETCH_LEAD_SECONDS", "15"))
+# Popularity halves every PREFETCH_HALF_LIFE seconds, so yesterday's hot keys cool down
+PREFETCH_HALF_LIFE = float(os.getenv("PREFETCH_HALF_LIFE", "600"))
+PREFETCH_MAX_TRACKED = int(os.getenv("PREFETCH_MAX_TRACKED", "1000"))
+# Keys whose decayed popularity falls below this score are dropped from the set
+PREFETCH_MIN_SCORE = float(os.getenv("PREFETCH_MIN_SCORE", "0.5"))
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "4"))
+
+
+# Keys of one kind that can be refreshed, e.g. weather or crypto quotes
+class _Source:
+    def __init__(self, refresh: Callable[[list[str]], Awaitable[None]], batch: bool):
+        self.refresh = refresh
+        self.batch = batch
+
+
+# Keeps the most requested cache keys warm. Every worker counts requested keys
+# locally and adds the counts to a Redis sorted set per kind each cycle. The
+# worker holding the leader lease decays and trims those sets (a bounded top-K)
+# and refreshes the top N keys shortly before their soft TTL runs out, at
+# jittered times so refreshes don't arrive at the upstream in bursts.
+class Prefetcher:
+    def __init__(
+        self,
+        enabled: bool = PREFETCH_ENABLED,
+        interval: float = PREFETCH_INTERVAL,
+        top_n: int = PREFETCH_TOP_N,
+        lead: float = PREFETCH_LEAD_SECONDS,
+        half_life: float = PREFETCH_HALF_LIFE,
+        max_tracked: int = PREFETCH_MAX_TRACKED,
+        min_score: float = PREFETCH_MIN_SCORE,
+        concurrency: int = PREFETCH_CONCURRENCY,
+    ):
+        self.enabled = enabled
+        self.interval = interval
+        self.top_n = top_n
+        self.lead = lead
+        self.decay = 0.5 ** (interval / half_life) if half_life > 0 else 1.0
+        self.max_tracked = max_tracked
+        self.min_score = min_score
+        self.lease = LeaderLease("prefetch", ttl_ms=int(interval * 3000))
+        self.concurrency = concurrency
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._sources: dict[str, _Source] = {}
+        self._counts: Counter[tuple[str, str]] = Counter()
+        self._scheduled: set[tuple[str, str]] = set()
+        self._tasks: set[asyncio.Task] = set()
+        self._loop_task: Optional[asyncio.Task] = None
+        self.refreshed = 0
+        self.failed = 0
+
+    # refresh(keys) re-fetches the given cache keys; batch sources get every
+    # due key in one call, the others one call per key
+    def register(
+        self,
+        kind: str,
+        refresh: Callable[[list[str]], Awaitable[None]],
+        batch: bool = False,
+    ):
+        self._sources[kind] = _Source(refresh, batch)
+
+    # Count a requested cache key, cheap enough for every request
+    def record(self, kind: str, key: str):
+        if not self.enabled:
+            return
+        if (kind, key) in self._counts or len(self._counts) < self.max_tracked:
+            self._counts[(kind, key)] += 1
+
+    async def start(self):
+        if self.enabled and self._loop_task is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+            self._loop_task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            self._loop_task = None
+        for task in list(self._tasks):
+            task.cancel()
+        self._scheduled.clear()
+        try:
+            await self.lease.release()
+        except Exception as e:
+            logger.warning("Releasing the prefetch lease failed: %s", e)
+
+    async def _run(self):
+        while True:
+            try:
+                await self._flush_counts()
+                if await self.lease.acquire_or_renew():
+                    for kind in self._sources:
+                        await self._plan(kind)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Prefetch cycle failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    async def _flush_counts(self):
+        if not self._counts:
+            return
+        counts, self._counts = self._counts, Counter()
+        async with redis_client.pipeline() as pipe:
+            for (kind, key), count in counts.items():
+                pipe.zincrby(f"popular:{kind}", count, key)
+
+    # Decay and trim the popularity of a kind, then schedule refreshes of the top
+    # keys. Keys nobody requests anymore decay below min_score and are dropped.
+    async def _plan(self, kind: str):
+        zkey = f"popular:{kind}"
+        async with redis_client.pipeline() as pipe:
+            pipe.zunionstore(zkey, {zkey: self.decay})
+            pipe.zremrangebyscore(zkey, "-inf", f"({self.min_score}")
+            pipe.zremrangebyrank(zkey, 0, -(self.max_tracked + 1))
+            pipe.zrevrange(zkey, 0, self.top_n - 1)
+            *_, members = await pipe.execute()
+        keys = [m.decode() if isinstance(m, bytes) else m for m in members]
+        if not keys:
+            return
+
+        now = time.time()
+        due: list[tuple[str, float]] = []
+        for key, entry in zip(keys, await redis_client.mget_json_entries(keys)):
+            if (kind, key) in self._scheduled:
+                continue
+            soft_left = entry.soft_expires_at - now if entry is not None else 0.0
+            if soft_left <= self.lead:
+                # Spread refreshes over the time left, at most one cycle
+                due.append(
+                    (key, random.uniform(0, min(self.interval, max(soft_left, 0))))
+                )
+        if not due:
+            return
+
+        source = self._sources[kind]
+        if source.batch:
+            delay = min(d for _, d in due)
+            self._schedule(kind, [k for k, _ in due], delay)
+        else:
+            for key, delay in due:
+                self._schedule(kind, [key], delay)
+
+    def _schedule(self, kind: str, keys: list[str], delay: float):
+        self._scheduled.update((kind, key) for key in keys)
+        task = asyncio.create_task(self._refresh(kind, keys, delay))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, kind: str, keys: list[str], delay: float):
+        try:
+            await asyncio.sleep(delay)
+            async with self._slots:
+                await self._sources[kind].refresh(keys)
+            self.refreshed += len(keys)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += len(keys)
+            logger.warning("Prefetch of %s %s failed: %s", kind, keys, e)
+        finally:
+            self._scheduled.difference_update((kind, key) for key in keys)
+
+    # Leadership, pending refreshes and the current top keys per kind
+    async def snapshot(self) -> dict:
+        snapshot = {
+            "enabled": self.enabled,
+            "leader": self.lease.is_leader,
+            "scheduled": len(self._scheduled),
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "top": {},
+        }
+        if not self.enabled:
+            return snapshot
+        try:
+            redis = await redis_client.connect()
+            for kind in self._sources:
+                top = await redis.zrevrange(
+                    f"popular:{kind}", 0, self.top_n - 1, withscores=True
+                )
+                snapshot["top"][kind] = {
+                    (m.decode() if isinstance(m, bytes) else m): round(score, 2)
+                    for m, score in top
+                }
+        except Exception as e:
+            logger.warning("Reading prefetch popularity failed: %s", e)
+        return snapshot
+
+
+# Singleton scheduler shared by the cached services
+prefetcher = Prefetcher()
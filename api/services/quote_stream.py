@@ -0,0 +1,261 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Iterable, Optional
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+from api.db.redis import redis_client
+from api.services.coinmarketcap import crypto_service
+from api.services.credits import CreditScheduler
+from api.services.leader import LeaderLease
+
+load_dotenv(override=True)
+
+logger = logging.getLogger(__name__)
+
+# Seconds between quote polls of the cluster's stream leader
+STREAM_INTERVAL = float(os.getenv("STREAM_INTERVAL", "5"))
+STREAM_MAX_SYMBOLS = int(os.getenv("STREAM_MAX_SYMBOLS", "50"))
+# Updates buffered per connection, the oldest are dropped for slow clients
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "16"))
+# Seconds a symbol CoinMarketCap rejected is left out of the polls
+STREAM_REJECT_TTL = float(os.getenv("STREAM_REJECT_TTL", "600"))
+
+
+# One client's subscription: a bounded queue of serialized quote updates
+class Subscription:
+    def __init__(self, maxsize: int = STREAM_QUEUE_SIZE):
+        self.topics: set[str] = set()
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def push(self, message: str):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout: float | None = None) -> Optional[str]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+# Pushes quote updates to subscribed clients. Workers advertise the topics
+# ("SYMBOL:CONVERT") their clients follow in a Redis sorted set, scored by
+# expiry and refreshed every interval. The worker holding the stream lease polls
+# all advertised topics once per interval (through the quote cache, so within
+# the credit budget) and publishes changed quotes on one pub/sub channel. Every
+# worker fans those out to its local subscribers, so idle connections cost a
+# queue each and no JWT checks, DB lookups or upstream calls.
+class QuoteStream:
+    CHANNEL = "stream:quotes"
+    TOPICS_KEY = "stream:topics"
+
+    def __init__(self, interval: float = STREAM_INTERVAL):
+        self.interval = interval
+        self.lease = LeaderLease("quote-stream", ttl_ms=int(interval * 3000))
+        self._subscribers: dict[str, set[Subscription]] = {}
+        self._last_updated: dict[str, str] = {}
+        self._rejected: dict[str, float] = {}
+        self._tasks: list[asyncio.Task] = []
+        self.published = 0
+
+    @staticmethod
+    def topic(symbol: str, convert: str) -> str:
+        return f"{symbol.strip().upper()}:{convert.strip().upper()}"
+
+    # Subscribe to symbols, the current cached quotes are queued right away
+    async def subscribe(
+        self, sub: Subscription, symbols: Iterable[str], convert: str = "USD"
+    ):
+        topics = [self.topic(s, convert) for s in symbols if s.strip()]
+        new = [t for t in dict.fromkeys(topics) if t not in sub.topics]
+        if len(sub.topics) + len(new) > STREAM_MAX_SYMBOLS:
+            raise ValueError(f"At most {STREAM_MAX_SYMBOLS} symbols per connection")
+        for topic in new:
+            sub.topics.add(topic)
+            self._subscribers.setdefault(topic, set()).add(sub)
+        self._ensure_started()
+        if new:
+            await self._advertise(new)
+            await self._send_cached(sub, new)
+
+    def unsubscribe(self, sub: Subscription, symbols: Iterable[str], convert: str):
+        for topic in {self.topic(s, convert) for s in symbols}:
+            self._drop(sub, topic)
+
+    def close(self, sub: Subscription):
+        for topic in list(sub.topics):
+            self._drop(sub, topic)
+
+    def _drop(self, sub: Subscription, topic: str):
+        sub.topics.discard(topic)
+        subscribers = self._subscribers.get(topic)
+        if subscribers is not None:
+            subscribers.discard(sub)
+            if not subscribers:
+                del self._subscribers[topic]
+
+    async def _send_cached(self, sub: Subscription, topics: list[str]):
+        keys = [crypto_service.cache_key(*t.split(":", 1)) for t in topics]
+        for topic, entry in zip(topics, await redis_client.mget_json_entries(keys)):
+            if entry is not None:
+                sub.push(self._message(topic, entry.value))
+
+    @staticmethod
+    def _message(topic: str, quote: dict) -> str:
+        symbol, convert = topic.split(":", 1)
+        return json.dumps({"symbol": symbol, "convert": convert, "data": quote})
+
+    def _ensure_started(self):
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._run()),
+                asyncio.create_task(self._listen()),
+            ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        try:
+            await self.lease.release()
+        except Exception as e:
+            logger.warning("Releasing the quote stream lease failed: %s", e)
+
+    # Topics followed on this worker stay advertised while it keeps renewing them
+    async def _advertise(self, topics: Iterable[str]):
+        expires_at = time.time() + self.interval * 3
+        mapping = {topic: expires_at for topic in topics}
+        if mapping:
+            async with redis_client.pipeline() as pipe:
+                pipe.zadd(self.TOPICS_KEY, mapping)
+
+    async def _run(self):
+        while True:
+            try:
+                await self._advertise(list(self._subscribers))
+                if await self.lease.acquire_or_renew():
+                    await self._poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Quote stream cycle failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    # Leader only: fetch every advertised topic and publish the changed quotes
+    async def _poll(self):
+        async with redis_client.pipeline() as pipe:
+            pipe.zremrangebyscore(self.TOPICS_KEY, "-inf", time.time())
+            pipe.zrange(self.TOPICS_KEY, 0, -1)
+            _, members = await pipe.execute()
+        now = time.time()
+        self._rejected = {
+            t: until for t, until in self._rejected.items() if until > now
+        }
+        by_convert: dict[str, list[str]] = {}
+        for member in members:
+            topic = member.decode() if isinstance(member, bytes) else member
+            if topic in self._rejected:
+                continue
+            symbol, convert = topic.split(":", 1)
+            by_convert.setdefault(convert, []).append(symbol)
+
+        for convert, symbols in by_convert.items():
+            try:
+                quotes = await self._fetch(symbols, convert)
+            except Exception as e:
+                logger.warning("Quote stream poll of %s failed: %s", convert, e)
+                continue
+            async with redis_client.pipeline() as pipe:
+                for symbol, quote in quotes.items():
+                    topic = self.topic(symbol, convert)
+                    updated = str(quote.get("last_updated"))
+                    if self._last_updated.get(topic) == updated:
+                        continue
+                    self._last_updated[topic] = updated
+                    pipe.publish(self.CHANNEL, self._message(topic, quote))
+                    self.published += 1
+
+    # Quotes of all symbols of a convert in one call. CoinMarketCap rejects the
+    # whole call with 400 for a single invalid symbol, so then every symbol is
+    # fetched on its own (through the cache) and the rejected ones are left out
+    # of the polls for STREAM_REJECT_TTL, instead of one client's typo stopping
+    # the updates of everyone else. Polls queue behind interactive requests
+    # for CoinMarketCap credits.
+    async def _fetch(self, symbols: list[str], convert: str) -> dict:
+        try:
+            response = await crypto_service.get_cryptocurrencies(
+                ",".join(symbols), convert=convert, priority=CreditScheduler.BACKGROUND
+            )
+            return response.get("data") or {}
+        except HTTPException as e:
+            if e.status_code != 400:
+                raise
+            if len(symbols) == 1:
+                self._reject(symbols[0], convert)
+                return {}
+
+        quotes = {}
+        for symbol in symbols:
+            try:
+                response = await crypto_service.get_cryptocurrencies(
+                    symbol, convert=convert, priority=CreditScheduler.BACKGROUND
+                )
+                quotes.update(response.get("data") or {})
+            except HTTPException as e:
+                if e.status_code != 400:
+                    raise
+                self._reject(symbol, convert)
+        return quotes
+
+    def _reject(self, symbol: str, convert: str):
+        logger.info(
+            "CoinMarketCap rejected %s in %s, not streaming it", symbol, convert
+        )
+        self._rejected[self.topic(symbol, convert)] = time.time() + STREAM_REJECT_TTL
+
+    # Every worker: fan published quotes out to the local subscribers
+    async def _listen(self):
+        while True:
+            pubsub = (await redis_client.connect()).pubsub()
+            try:
+                await pubsub.subscribe(self.CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    data = message["data"]
+                    if isinstance(data, bytes):
+                        data = data.decode()
+                    update = json.loads(data)
+                    topic = self.topic(update["symbol"], update["convert"])
+                    for sub in self._subscribers.get(topic, ()):
+                        sub.push(data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Quote stream listener failed: %s", e)
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    def stats(self) -> dict:
+        connections = {sub for subs in self._subscribers.values() for sub in subs}
+        return {
+            "leader": self.lease.is_leader,
+            "connections": len(connections),
+            "topics": len(self._subscribers),
+            "published": self.published,
+            "rejected": sorted(self._rejected),
+            "dropped": sum(sub.dropped for sub in connections),
+        }
+
+
+# Singleton stream shared by the SSE and WebSocket endpoints
+quote_stream = QuoteStream()
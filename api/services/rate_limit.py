@@ -0,0 +1,106 @@
+import logging
+import math
+import os
+from typing import Annotated, Optional
+
+from dotenv import load_dotenv
+from fastapi import Depends, HTTPException, Request, Response
+
+from api.auth.auth_schemes import Principal
+from api.auth.auth_service import get_current_active_user
+from api.db.redis import redis_client
+
+load_dotenv(override=True)
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true") == "true"
+
+# GCRA: the key holds the theoretical arrival time (TAT) of the next request.
+# A request is allowed while the TAT stays within limit * interval of now, so
+# bursts of up to `limit` are allowed and then requests are spaced evenly.
+# Uses the Redis clock so every worker sees the same schedule.
+# Returns {allowed, remaining, ms until allowed, ms until the limit is fully reset}
+GCRA_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call("TIME")
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local tolerance = interval * limit
+
+local tat = math.max(tonumber(redis.call("GET", KEYS[1]) or "0"), now)
+local new_tat = tat + interval * cost
+local allow_at = new_tat - tolerance
+if allow_at > now then
+    return {0, 0, math.ceil(allow_at - now), math.ceil(tat - now)}
+end
+
+redis.call("SET", KEYS[1], tostring(new_tat), "PX", math.ceil(new_tat - now))
+local remaining = math.floor((tolerance - (new_tat - now)) / interval)
+return {1, remaining, 0, math.ceil(new_tat - now)}
+"""
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+# "60/minute" -> (60, 60.0)
+def parse_rate(rate: str) -> tuple[int, float]:
+    count, _, period = rate.partition("/")
+    if period not in PERIODS:
+        raise ValueError(f"Invalid rate limit {rate!r}, expected e.g. '60/minute'")
+    return int(count), float(PERIODS[period])
+
+
+# Dependency limiting a route to `rate` requests per client, keyed on the client
+# IP. Adds RateLimit-* headers to the response and rejects with 429 + Retry-After.
+class RateLimit:
+    def __init__(self, name: str, rate: str, enabled: bool = RATE_LIMIT_ENABLED):
+        self.name = name
+        self.limit, self.period = parse_rate(rate)
+        self.interval_ms = self.period * 1000 / max(self.limit, 1)
+        self.enabled = enabled and self.limit > 0
+
+    async def __call__(self, request: Request, response: Response):
+        client = request.client.host if request.client else "unknown"
+        await self.check(f"ip:{client}", response)
+
+    # response is None where there are no headers to set (WebSockets)
+    async def check(self, key: str, response: Optional[Response] = None):
+        if not self.enabled:
+            return
+        try:
+            allowed, remaining, retry_ms, reset_ms = await redis_client.eval(
+                GCRA_SCRIPT,
+                [f"ratelimit:{self.name}:{key}"],
+                [self.interval_ms, self.limit, 1],
+            )
+        except Exception as e:
+            # A Redis outage shouldn't take the API down with it
+            logger.warning("Rate limit check of %s failed: %s", self.name, e)
+            return
+
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(max(0, remaining)),
+            "RateLimit-Reset": str(math.ceil(reset_ms / 1000)),
+            "RateLimit-Policy": f"{self.limit};w={int(self.period)}",
+        }
+        if not allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(retry_ms / 1000)))
+            raise HTTPException(
+                status_code=429, detail="Too many requests", headers=headers
+            )
+        if response is not None:
+            response.headers.update(headers)
+
+
+# Same limit keyed on the authenticated user (the JWT sub), the user dependency
+# is shared with the route so the token is only checked once per request
+class UserRateLimit(RateLimit):
+    async def __call__(
+        self,
+        response: Response,
+        user: Annotated[Principal, Depends(get_current_active_user)],
+    ):
+        await self.check(f"user:{user.username}", response)
@@ -0,0 +1,278 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+from api.metrics import upstream_request_duration
+
+load_dotenv(override=True)
+
+# Defaults for every upstream, see Upstream below
+UPSTREAM_BREAKER_FAILURES = int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5"))
+UPSTREAM_BREAKER_RESET = float(os.getenv("UPSTREAM_BREAKER_RESET", "30"))
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "2"))
+UPSTREAM_RETRY_BUDGET_RATIO = float(os.getenv("UPSTREAM_RETRY_BUDGET_RATIO", "0.1"))
+UPSTREAM_RETRY_MIN_PER_SEC = float(os.getenv("UPSTREAM_RETRY_MIN_PER_SEC", "1"))
+UPSTREAM_HEDGE_PERCENTILE = float(os.getenv("UPSTREAM_HEDGE_PERCENTILE", "0"))
+
+
+# Raised instead of calling an upstream whose circuit breaker is open
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Upstream {name} is unavailable (circuit open)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+# Opens after `failure_threshold` consecutive failures and rejects calls for
+# `reset_timeout` seconds, then lets a single trial call through (half-open)
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+            self._trial_running = False
+        if self._trial_running:
+            return False
+        self._trial_running = True
+        return True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._trial_running = False
+
+    # The caller gave up on a call: only a trial decides anything, it reopens
+    # the breaker so it can't stay half-open with no trial running
+    def record_cancelled(self):
+        if self.state == self.HALF_OPEN:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._trial_running = False
+
+    def retry_after(self) -> float:
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+
+# Retries may use at most `ratio` of the request volume (plus a small
+# per-second allowance), so retries can't multiply load on a failing upstream
+class RetryBudget:
+    def __init__(self, ratio: float = 0.1, min_per_second: float = 1.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = max(10.0, min_per_second * 10)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, amount: float = 0.0):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self.tokens = min(
+            self.capacity, self.tokens + elapsed * self.min_per_second + amount
+        )
+
+    # Every original request earns `ratio` of a retry
+    def deposit(self):
+        self._refill(self.ratio)
+
+    def withdraw(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+# Resilience policy of one upstream: circuit breaker, retries with full jitter
+# limited by a retry budget, and optional hedging (a second attempt once the
+# first is slower than the given latency percentile of recent calls)
+class Upstream:
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = UPSTREAM_BREAKER_FAILURES,
+        reset_timeout: float = UPSTREAM_BREAKER_RESET,
+        max_retries: int = UPSTREAM_MAX_RETRIES,
+        retry_ratio: float = UPSTREAM_RETRY_BUDGET_RATIO,
+        retry_min_per_second: float = UPSTREAM_RETRY_MIN_PER_SEC,
+        hedge_percentile: float = UPSTREAM_HEDGE_PERCENTILE,
+        hedge_min_samples: int = 20,
+        backoff_base: float = 0.05,
+        backoff_max: float = 1.0,
+    ):
+        self.name = name
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.budget = RetryBudget(retry_ratio, retry_min_per_second)
+        self.max_retries = max_retries
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._latencies: deque[float] = deque(maxlen=200)
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.hedges = 0
+        self.rejected = 0
+
+    # Failures that count against the breaker and may be retried
+    @staticmethod
+    def is_failure(resp: httpx.Response) -> bool:
+        return resp.status_code >= 500
+
+    async def call(
+        self, attempt: Callable[[], Awaitable[httpx.Response]]
+    ) -> httpx.Response:
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise CircuitOpenError(self.name, self.breaker.retry_after())
+
+        self.calls += 1
+        self.budget.deposit()
+        try_number = 0
+        while True:
+            error: Optional[Exception] = None
+            resp: Optional[httpx.Response] = None
+            try:
+                resp = await self._attempt(lambda: self._timed(attempt))
+            except httpx.RequestError as e:
+                error = e
+            except asyncio.CancelledError:
+                self.breaker.record_cancelled()
+                raise
+            except BaseException:
+                self.failures += 1
+                self.breaker.record_failure()
+                raise
+
+            if resp is not None and not self.is_failure(resp):
+                self.breaker.record_success()
+                return resp
+
+            self.failures += 1
+            self.breaker.record_failure()
+            if (
+                try_number >= self.max_retries
+                or not self.breaker.allow()
+                or not self.budget.withdraw()
+            ):
+                if error is not None:
+                    raise error
+                return resp
+
+            try_number += 1
+            self.retries += 1
+            delay = min(self.backoff_max, self.backoff_base * 2**try_number)
+            await asyncio.sleep(random.uniform(0, delay))
+
+    # Record latency and status of every attempt, hedges included
+    async def _timed(
+        self, attempt: Callable[[], Awaitable[httpx.Response]]
+    ) -> httpx.Response:
+        start = time.perf_counter()
+        status = "error"
+        try:
+            resp = await attempt()
+            status = str(resp.status_code)
+            return resp
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        finally:
+            upstream_request_duration.labels(self.name, status).observe(
+                time.perf_counter() - start
+            )
+
+    # One attempt, hedged with a second one if it is slower than usual
+    async def _attempt(
+        self, attempt: Callable[[], Awaitable[httpx.Response]]
+    ) -> httpx.Response:
+        start = time.perf_counter()
+        hedge_after = self.hedge_delay()
+        if hedge_after is None:
+            resp = await attempt()
+            self._latencies.append(time.perf_counter() - start)
+            return resp
+
+        tasks = [asyncio.ensure_future(attempt())]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if not done:
+                self.hedges += 1
+                tasks.append(asyncio.ensure_future(attempt()))
+            # First attempt to succeed wins, otherwise the last one to fail
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None and not self.is_failure(task.result()):
+                        self._latencies.append(time.perf_counter() - start)
+                        return task.result()
+            return tasks[-1].result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    # Seconds after which a hedge is sent, None when hedging is off or unprimed
+    def hedge_delay(self) -> Optional[float]:
+        if self.hedge_percentile <= 0 or len(self._latencies) < self.hedge_min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile / 100))
+        return ordered[index]
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "retry_after": round(self.breaker.retry_after(), 3),
+            "retry_budget": round(self.budget.tokens, 2),
+            "hedge_after": self.hedge_delay(),
+            "calls": self.calls,
+            "failures": self.failures,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "rejected": self.rejected,
+        }
+
+
+# Shared policies by upstream name
+upstreams: dict[str, Upstream] = {}
+
+
+def get_upstream(name: str) -> Upstream:
+    if name not in upstreams:
+        upstreams[name] = Upstream(name)
+    return upstreams[name]
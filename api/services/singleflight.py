@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from api.db.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+# Coalesces concurrent calls for the same key into one in-flight execution.
+# With distributed=True the winner of the local race also takes a Redis lock,
+# so only one worker/replica in the cluster hits the upstream for a key.
+class SingleFlight:
+    def __init__(
+        self,
+        distributed: bool = False,
+        lock_ttl_ms: int = 5000,
+        poll_interval: float = 0.05,
+    ):
+        self.distributed = distributed
+        self.lock_ttl_ms = lock_ttl_ms
+        self.poll_interval = poll_interval
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        recheck: Optional[Callable[[], Awaitable[Any]]] = None,
+    ) -> Any:
+        future = self._inflight.get(key)
+        if future is None:
+            if self.distributed and recheck is not None:
+                future = asyncio.ensure_future(self._run_locked(key, fn, recheck))
+            else:
+                future = asyncio.ensure_future(fn())
+            self._inflight[key] = future
+            future.add_done_callback(lambda f: self._forget(key, f))
+
+        # Shield the shared call so a disconnecting client doesn't cancel it for the others
+        return await asyncio.shield(future)
+
+    def _forget(self, key: str, future: asyncio.Future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if not future.cancelled():
+            future.exception()  # mark as retrieved when every waiter is gone
+
+    # Fetch under a cluster-wide lock, or wait for the lock holder to fill the cache
+    async def _run_locked(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        recheck: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        lock_key = f"lock:{key}"
+        try:
+            token = await redis_client.acquire_lock(lock_key, ttl_ms=self.lock_ttl_ms)
+        except Exception as e:
+            logger.warning(
+                "Error acquiring single-flight lock, fetching directly: %s", e
+            )
+            return await fn()
+
+        if token:
+            try:
+                return await fn()
+            finally:
+                await redis_client.release_lock(lock_key, token)
+
+        deadline = time.monotonic() + self.lock_ttl_ms / 1000
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            result = await recheck()
+            if result:
+                return result
+            if await redis_client.get(lock_key) is None:
+                break
+
+        # The lock holder failed or is too slow, fall back to our own fetch
+        return await fn()
@@ -1,12 +1,39 @@
+import asyncio
+import logging
+import math
 import httpx
 from fastapi import HTTPException
 import os
+import unicodedata
 from dotenv import load_dotenv
-from typing import Dict, Optional, Any
-from api.db.redis import redis_client
+from typing import Dict, Any
+from api.db.redis import CacheEntry, LocalCache, redis_client
+from api.services.http_clients import http_clients
+from api.services.prefetch import prefetcher
+from api.services.resilience import CircuitOpenError, get_upstream
+from api.services.singleflight import SingleFlight
 
 load_dotenv(verbose=True)
 
+logger = logging.getLogger(__name__)
+
+# Serve fresh until the soft TTL, stale + background refresh until the hard TTL
+WEATHER_CACHE_SOFT_TTL = int(os.getenv("WEATHER_CACHE_SOFT_TTL", "300"))
+WEATHER_CACHE_HARD_TTL = int(os.getenv("WEATHER_CACHE_HARD_TTL", "900"))
+# Unknown cities are remembered briefly so typos don't reach OpenWeather every time
+WEATHER_NOT_FOUND_TTL = int(os.getenv("WEATHER_NOT_FOUND_TTL", "60"))
+# Cache by OpenWeather city id, so every spelling that resolves to a city shares one entry
+WEATHER_CITY_ALIASES = os.getenv("WEATHER_CITY_ALIASES", "false") == "true"
+WEATHER_ALIAS_TTL = int(os.getenv("WEATHER_ALIAS_TTL", str(7 * 24 * 3600)))
+
+# Cached in place of a city OpenWeather doesn't know
+NOT_FOUND = {"not_found": True}
+
+
+# Cache key form of a city: Unicode-normalized, case-folded, single spaces
+def canonical_city(city: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", city).casefold().split())
+
 
 # cryptocurrency service to interact with openWeather API
 class WeatherClient:
@@ -16,18 +43,32 @@ class WeatherClient:
         api_key: str | None = None,
         base_url: str = "https://api.openweathermap.org/data/2.5",
         timeout: float = 5.0,
+        distributed_lock: bool | None = None,
+        city_aliases: bool = WEATHER_CITY_ALIASES,
     ):
         self.api_key = api_key or os.getenv("API_KEY")
         if not self.api_key:
             raise RuntimeError("Не указан OPENWEATHER_API_KEY")
         self.base_url = base_url.rstrip("/")
         self.timeout = timeout
-        self._client: Optional[httpx.AsyncClient] = None
+        http_clients.register("openweather", self.base_url, timeout=timeout)
+        self.upstream = get_upstream("openweather")
+        # One upstream fetch per cache key, optionally across workers via a Redis lock
+        if distributed_lock is None:
+            distributed_lock = os.getenv("WEATHER_SINGLEFLIGHT_LOCK", "false") == "true"
+        self._singleflight = SingleFlight(distributed=distributed_lock)
+        self._background: set[asyncio.Task] = set()
+        # City name -> OpenWeather id, backed by weather:alias:<name> keys in Redis
+        self.city_aliases = city_aliases
+        self._aliases = LocalCache(ttl=WEATHER_ALIAS_TTL)
+        prefetcher.register("weather", self._prefetch)
 
     async def _get_client(self) -> httpx.AsyncClient:
-        if self._client is None:
-            self._client = httpx.AsyncClient(timeout=self.timeout)
-        return self._client
+        return http_clients.get("openweather")
+
+    @staticmethod
+    def cache_key(location: str, units: str, lang: str) -> str:
+        return f"weather:{location}:{units}:{lang}"
 
     async def current_weather(
         self,
@@ -35,28 +76,131 @@ class WeatherClient:
         units: str = "metric",
         lang: str = "ru",
     ) -> Dict[str, Any]:
+        return (await self.current_weather_entry(city, units, lang)).value
+
+    # Like current_weather, with the cache metadata HTTP validators are built from
+    async def current_weather_entry(
+        self,
+        city: str,
+        units: str = "metric",
+        lang: str = "ru",
+    ) -> CacheEntry:
+        name = canonical_city(city)
+        if not name:
+            raise HTTPException(status_code=400, detail="Город не указан")
 
         # Check cache first
-        cache_key = f"weather:{city}:{units}:{lang}"
-        cached_data = await redis_client.get_json(cache_key)
-        if cached_data:
-            return cached_data
+        location = await self._resolve(name)
+        cache_key = self.cache_key(location, units, lang)
+        entry = await redis_client.get_json_entry(cache_key)
+        if entry:
+            if entry.value == NOT_FOUND:
+                raise HTTPException(status_code=404, detail="Город не найден")
+            if entry.stale:
+                self._schedule_refresh(name, location, units, lang)
+            prefetcher.record("weather", cache_key)
+            return entry
 
+        entry = await self._refresh(name, location, units, lang)
+        # Only cities that exist are worth keeping warm
+        location = await self._resolve(name)
+        prefetcher.record("weather", self.cache_key(location, units, lang))
+        return entry
+
+    # Location to query and cache a city under: "id:<city id>" once its alias
+    # is known, otherwise the canonical name
+    async def _resolve(self, name: str) -> str:
+        if not self.city_aliases:
+            return name
+        city_id = self._aliases.get(name)
+        if city_id is None:
+            city_id = await redis_client.get(f"weather:alias:{name}")
+            if city_id:
+                self._aliases.set(name, city_id, len(city_id))
+        return f"id:{city_id}" if city_id else name
+
+    async def _remember_alias(self, name: str, city_id: str):
+        self._aliases.set(name, city_id, len(city_id))
+        try:
+            await redis_client.set(
+                f"weather:alias:{name}", city_id, ex=WEATHER_ALIAS_TTL
+            )
+        except Exception as e:
+            logger.warning("Storing the city alias of %s failed: %s", name, e)
+
+    # Coalesced upstream fetch, waiters on other workers only accept a fresh entry
+    async def _refresh(
+        self, name: str, location: str, units: str, lang: str
+    ) -> CacheEntry:
+        async def fresh_from_cache():
+            key = self.cache_key(await self._resolve(name), units, lang)
+            entry = await redis_client.get_json_entry(key)
+            if entry and entry.value == NOT_FOUND:
+                raise HTTPException(status_code=404, detail="Город не найден")
+            return entry if entry and not entry.stale else None
+
+        return await self._singleflight.do(
+            self.cache_key(location, units, lang),
+            lambda: self._fetch_weather(location, units, lang),
+            recheck=fresh_from_cache,
+        )
+
+    # Re-fetch popular entries before they go stale, called by the prefetcher
+    async def _prefetch(self, cache_keys: list[str]):
+        for cache_key in cache_keys:
+            location, units, lang = cache_key.removeprefix("weather:").rsplit(":", 2)
+            await self._singleflight.do(
+                cache_key, lambda: self._fetch_weather(location, units, lang)
+            )
+
+    # Refresh a stale entry without making the current request wait for it
+    def _schedule_refresh(self, name: str, location: str, units: str, lang: str):
+        task = asyncio.create_task(self._refresh_quietly(name, location, units, lang))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _refresh_quietly(self, name: str, location: str, units: str, lang: str):
+        try:
+            await self._refresh(name, location, units, lang)
+        except Exception as e:
+            logger.warning("Background refresh of %s failed: %s", location, e)
+
+    # Fetch weather from OpenWeather and cache the normalized result.
+    # location is a canonical city name or "id:<city id>"
+    async def _fetch_weather(self, location: str, units: str, lang: str) -> CacheEntry:
+        cache_key = self.cache_key(location, units, lang)
+        by_id = location.startswith("id:")
         params = {
-            "q": city,
             "appid": self.api_key,
             "units": units,
             "lang": lang,
         }
+        if by_id:
+            params["id"] = location.removeprefix("id:")
+        else:
+            params["q"] = location
         url = f"{self.base_url}/weather"
 
         client = await self._get_client()
         try:
-            resp = await client.get(url, params=params)
+            resp = await self.upstream.call(lambda: client.get(url, params=params))
+        except CircuitOpenError as e:
+            # Stale entries are still served by current_weather, only misses end here
+            raise HTTPException(
+                status_code=503,
+                detail="Сервис погоды временно недоступен",
+                headers={"Retry-After": str(math.ceil(e.retry_after))},
+            ) from e
         except httpx.RequestError as e:
             raise HTTPException(status_code=502, detail=f"Сеть недоступна: {e}") from e
 
         if resp.status_code == 404:
+            await redis_client.cache_json(
+                cache_key,
+                NOT_FOUND,
+                ttl=WEATHER_NOT_FOUND_TTL,
+                soft_ttl=WEATHER_NOT_FOUND_TTL,
+            )
             raise HTTPException(status_code=404, detail="Город не найден")
         if resp.status_code >= 400:
             raise HTTPException(
@@ -77,6 +221,18 @@ class WeatherClient:
         }
         result = {"data": normalized}
 
-        await redis_client.cache_json(cache_key, result, ttl=300)  # Cache for 5 minutes
+        # From now on this name is looked up and cached under the city id
+        if self.city_aliases and not by_id and data.get("id"):
+            await self._remember_alias(location, str(data["id"]))
+            cache_key = self.cache_key(f"id:{data['id']}", units, lang)
+
+        return await redis_client.cache_json(
+            cache_key,
+            result,
+            ttl=WEATHER_CACHE_HARD_TTL,
+            soft_ttl=WEATHER_CACHE_SOFT_TTL,
+        )
+
 
-        return result
+# Singleton instance of the weather client
+weather_client = WeatherClient()
@@ -0,0 +1,38 @@
+import logging
+import pytest
+
+from api.middleware.access_log import AccessLogMiddleware, redact_headers
+
+
+def test_redact_headers():  # bearer tokens never reach the log
+    headers = redact_headers(
+        [(b"Authorization", b"Bearer secret"), (b"accept", b"application/json")]
+    )
+    assert headers == {"Authorization": "[redacted]", "accept": "application/json"}
+
+
+@pytest.mark.asyncio
+async def test_access_log_samples_but_keeps_errors(caplog):  # 5xx are always logged
+    async def app(scope, receive, send):
+        status = 500 if scope["path"] == "/fail" else 200
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    middleware = AccessLogMiddleware(app, sample_rate=0, slow_ms=10_000)
+    caplog.set_level(logging.INFO, logger="api.access")
+    for path in ["/ok", "/fail"]:
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": path,
+            "query_string": b"",
+            "headers": [],
+            "client": ("127.0.0.1", 1234),
+        }
+        await middleware(scope, None, send)
+
+    assert len(caplog.records) == 1
+    assert '"GET /fail" 500' in caplog.records[0].getMessage()
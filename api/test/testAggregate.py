@@ -0,0 +1,61 @@
+import asyncio
+import uuid
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from api.auth.auth_schemes import Principal
+from api.auth.auth_service import get_current_active_user
+from api.db.redis import redis_client
+from api.routers import aggregateRouter
+from api.services.http_clients import http_clients
+
+
+@pytest.mark.asyncio
+async def test_slow_item_hits_its_deadline(monkeypatch):  # the rest is still served
+    run = uuid.uuid4().hex[:8]
+    fast, slow = f"Fast{run}", f"Slow{run}"
+    btc, eth, bad = f"B{run}".upper(), f"E{run}".upper(), f"X{run}".upper()
+
+    async def openweather(request: httpx.Request) -> httpx.Response:
+        city = request.url.params["q"]
+        if city.startswith("slow"):
+            await asyncio.sleep(5)
+        return httpx.Response(200, json={"name": city, "main": {"temp": 3}})
+
+    # Like CoinMarketCap, an unknown symbol fails the whole request
+    def coinmarketcap(request: httpx.Request) -> httpx.Response:
+        requested = request.url.params["symbol"].split(",")
+        unknown = [s for s in requested if s not in (btc, eth)]
+        if unknown:
+            message = f'Invalid value for "symbol": "{",".join(unknown)}"'
+            return httpx.Response(
+                400, json={"status": {"error_code": 400, "error_message": message}}
+            )
+        data = {s: {"symbol": s, "quote": {"USD": {"price": 1.5}}} for s in requested}
+        return httpx.Response(200, json={"status": {"credit_count": 1}, "data": data})
+
+    http_clients.set_transport("openweather", httpx.MockTransport(openweather))
+    http_clients.set_transport("coinmarketcap", httpx.MockTransport(coinmarketcap))
+    monkeypatch.setattr(aggregateRouter, "AGGREGATE_WEATHER_DEADLINE", 0.2)
+    app = FastAPI()
+    app.include_router(aggregateRouter.router)
+    user = Principal(id="1", username=f"agg-{uuid.uuid4().hex}", is_active=True)
+    app.dependency_overrides[get_current_active_user] = lambda: user
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+        resp = await client.get(
+            "/aggregate/",
+            params={"cities": [fast, slow], "symbols": [btc, bad, eth]},
+        )
+    assert resp.status_code == 200
+    body = resp.json()
+    assert list(body["weather"]) == [fast]
+    # Only the invalid symbol fails, the others are retried on their own
+    assert list(body["crypto"]) == [btc, eth]
+    assert body["crypto"][eth]["price"] == 1.5
+    errors = {(e["item"], e["status"]) for e in body["errors"]}
+    assert errors == {(slow, 504), (bad, 400)}
+    await redis_client.disconnect()
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import tempfile
+import uuid
+
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from api.auth.auth_model import User
+from api.auth.auth_schemes import Principal
+from api.auth.auth_service import (
+    PasswordHasher,
+    get_current_active_user,
+    password_hasher,
+)
+from api.auth.authRouter import router as auth_router
+from api.db.db_postgres import Base, get_session
+from api.db.redis import redis_client
+
+
+@pytest.mark.asyncio
+async def test_bulk_register_results_per_row(monkeypatch):  # created, invalid, dupes
+    path = os.path.join(tempfile.mkdtemp(), "bulk.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    async with sessions() as session:
+        session.add(
+            User(username="taken", email="taken@example.com", hashed_password="x")
+        )
+        await session.commit()
+
+    async def get_test_session():
+        async with sessions() as session:
+            yield session
+
+    # No pooled connection is held while the batch is hashed
+    hash_many = password_hasher.hash_many
+    checked_out = []
+
+    async def hash_many_checked(passwords):
+        checked_out.append(engine.pool.checkedout())
+        return await hash_many(passwords)
+
+    monkeypatch.setattr(password_hasher, "hash_many", hash_many_checked)
+
+    app = FastAPI()
+    app.include_router(auth_router)
+    app.dependency_overrides[get_session] = get_test_session
+    user = Principal(id="1", username=f"bulk-{uuid.uuid4().hex}", is_active=True)
+    app.dependency_overrides[get_current_active_user] = lambda: user
+
+    rows = [
+        {"username": "alice", "email": "alice@example.com", "password": "secret1"},
+        {"username": "al", "email": "al@example.com", "password": "secret1"},
+        {"username": "alice", "email": "other@example.com", "password": "secret1"},
+        {"username": "taken", "email": "new@example.com", "password": "secret1"},
+        {"username": "bob", "email": "bob@example.com", "password": "secret1"},
+    ]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+        resp = await client.post("/auth/register/bulk", json=rows)
+    assert resp.status_code == 200
+    body = resp.json()
+    assert (body["created"], body["failed"]) == (2, 3)
+    results = body["results"]
+    assert [r["status"] for r in results] == [
+        "created",
+        "error",
+        "error",
+        "error",
+        "created",
+    ]
+    assert results[1]["error"].startswith("username:")
+    assert results[2]["error"] == "Duplicate username or email in batch"
+    assert results[3]["error"] == "Username or email already exists"
+    assert "RateLimit-Remaining" in resp.headers
+    assert password_hasher.in_flight == 0
+    assert checked_out == [0]
+
+    await engine.dispose()
+    await redis_client.disconnect()
+
+
+@pytest.mark.asyncio
+async def test_bulk_hashes_count_towards_admission():  # logins still fail fast
+    hasher = PasswordHasher(workers=1, max_queue=0)
+    batch = asyncio.create_task(hasher.hash_many(["secret1", "secret2"]))
+    while hasher.in_flight == 0:
+        await asyncio.sleep(0.001)
+    with pytest.raises(HTTPException) as e:
+        await hasher.hash("secret3")
+    assert e.value.status_code == 503
+    assert len(await batch) == 2 and hasher.in_flight == 0
+    hasher.shutdown()
@@ -0,0 +1,44 @@
+import json
+import pytest
+
+from api.db.codecs import PayloadCodec
+
+PAYLOAD = {
+    "data": {"city": "Москва", "temp": 12.5, "humidity": 81, "weather": None},
+    "symbols": ["BTC", "ETH"] * 200,
+}
+
+# Optional packages behind each codec / compression name
+OPTIONAL = {"orjson": "orjson", "msgpack": "msgpack", "zstd": "zstandard", "lz4": "lz4"}
+
+
+@pytest.mark.parametrize("codec", ["json", "orjson", "msgpack"])
+@pytest.mark.parametrize("compression", ["none", "zstd", "lz4"])
+def test_codec_round_trip(codec, compression):  # every combination decodes back
+    for name in (codec, compression):
+        if name in OPTIONAL:
+            pytest.importorskip(OPTIONAL[name])
+
+    payload_codec = PayloadCodec(codec, compression, min_size=64)
+    encoded = payload_codec.encode(PAYLOAD)
+    assert encoded[0] == 0
+    assert payload_codec.decode(encoded) == PAYLOAD
+    if compression != "none":
+        assert encoded[2] != 0
+
+
+def test_codec_reads_legacy_and_other_codecs():  # no flush needed to switch codecs
+    pytest.importorskip("orjson")
+    legacy = json.dumps(PAYLOAD)
+    reader = PayloadCodec("json")
+    assert reader.decode(legacy) == PAYLOAD
+    assert reader.decode(legacy.encode()) == PAYLOAD
+
+    written = PayloadCodec("orjson").encode(PAYLOAD)
+    assert reader.decode(written) == PAYLOAD
+
+
+def test_codec_skips_compression_below_threshold():  # small values stay uncompressed
+    pytest.importorskip("zstandard")
+    payload_codec = PayloadCodec("json", "zstd", min_size=1024 * 1024)
+    assert payload_codec.encode(PAYLOAD)[2] == 0
@@ -0,0 +1,128 @@
+import asyncio
+import uuid
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from api.db.redis import redis_client
+from api.services.coinmarketcap import CryptoCurrencyService, QuoteBatcher
+from api.services.http_clients import http_clients
+from api.services.resilience import Upstream
+
+
+class FakeQuotes:
+    def __init__(self, invalid: tuple[str, ...] = ()):
+        self.invalid = invalid
+        self.calls: list[tuple[list[str], str]] = []
+
+    async def __call__(self, symbols: list[str], convert: str) -> dict:
+        self.calls.append((symbols, convert))
+        if any(s in self.invalid for s in symbols):
+            raise HTTPException(status_code=400, detail="Invalid value for symbol")
+        return {"data": {s: {"symbol": s} for s in symbols}}
+
+
+@pytest.mark.asyncio
+async def test_batch_flushes_after_window():  # one call per convert currency
+    fetch = FakeQuotes()
+    batcher = QuoteBatcher(fetch, window=0.01)
+    btc, eth, eur = await asyncio.gather(
+        batcher.load(["BTC"], "USD"),
+        batcher.load(["ETH", "BTC"], "USD"),
+        batcher.load(["BTC"], "EUR"),
+    )
+    assert btc is eth and set(btc["data"]) == {"BTC", "ETH"}
+    assert sorted(fetch.calls) == [(["BTC"], "EUR"), (["BTC", "ETH"], "USD")]
+
+
+@pytest.mark.asyncio
+async def test_batch_flushes_at_max_symbols():  # without waiting for the window
+    fetch = FakeQuotes()
+    batcher = QuoteBatcher(fetch, window=60, max_symbols=2)
+    first, second = await asyncio.wait_for(
+        asyncio.gather(batcher.load(["BTC"], "USD"), batcher.load(["ETH"], "USD")),
+        timeout=1,
+    )
+    assert first is second and fetch.calls == [(["BTC", "ETH"], "USD")]
+
+    # A lookup that doesn't fit flushes the pending batch and starts a new one
+    pending = asyncio.create_task(batcher.load(["SOL"], "USD"))
+    await asyncio.sleep(0)
+    overflow = asyncio.create_task(batcher.load(["ADA", "XRP"], "USD"))
+    assert set((await asyncio.wait_for(pending, 1))["data"]) == {"SOL"}
+    assert set((await asyncio.wait_for(overflow, 1))["data"]) == {"ADA", "XRP"}
+
+
+@pytest.mark.asyncio
+async def test_invalid_symbol_only_fails_its_caller():  # the others retry alone
+    fetch = FakeQuotes(invalid=("NOPE",))
+    batcher = QuoteBatcher(fetch, window=0.01)
+    good, bad = await asyncio.gather(
+        batcher.load(["BTC"], "USD"),
+        batcher.load(["NOPE"], "USD"),
+        return_exceptions=True,
+    )
+    assert set(good["data"]) == {"BTC"}
+    assert isinstance(bad, HTTPException) and bad.status_code == 400
+    assert fetch.calls[0] == (["BTC", "NOPE"], "USD")
+    assert sorted(fetch.calls[1:]) == [(["BTC"], "USD"), (["NOPE"], "USD")]
+
+
+# Service without batching or retries, answering from `handler`
+def quote_service(handler) -> CryptoCurrencyService:
+    http_clients.set_transport("coinmarketcap", httpx.MockTransport(handler))
+    service = CryptoCurrencyService(batch_window_ms=0)
+    service.upstream = Upstream(f"cmc-{uuid.uuid4().hex}", max_retries=0)
+    return service
+
+
+def quotes_response(symbols: list[str]) -> httpx.Response:
+    data = {s: {"symbol": s, "quote": {"USD": {"price": 2.0}}} for s in symbols}
+    return httpx.Response(200, json={"status": {"credit_count": 1}, "data": data})
+
+
+@pytest.mark.asyncio
+async def test_partial_hit_fetches_only_missing():  # merged in request order
+    run = uuid.uuid4().hex[:6].upper()
+    cached, first, last = f"C{run}", f"F{run}", f"L{run}"
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(request.url.params["symbol"])
+        return quotes_response(request.url.params["symbol"].split(","))
+
+    service = quote_service(handler)
+    await redis_client.cache_json(
+        service.cache_key(cached, "USD"), {"symbol": cached, "price": 1.0}, ttl=60
+    )
+    response = await service.get_cryptocurrencies(f"{first},{cached},{last}")
+    assert requested == [f"{first},{last}"]
+    assert list(response["data"]) == [first, cached, last]
+    assert response["data"][cached]["price"] == 1.0
+    assert response["data"][last]["price"] == 2.0
+    await redis_client.disconnect()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("status", [500, 429])
+async def test_stale_quotes_when_upstream_unavailable(status):  # all or nothing
+    run = uuid.uuid4().hex[:6].upper()
+    stale, unknown = f"S{run}", f"U{run}"
+    service = quote_service(lambda request: httpx.Response(status, json={}))
+    await redis_client.cache_json(
+        service.cache_key(stale, "USD"),
+        {"symbol": stale, "price": 1.0},
+        ttl=60,
+        soft_ttl=0,
+    )
+
+    response = await service.get_cryptocurrencies(stale)
+    assert response["data"][stale]["price"] == 1.0
+    assert "serving last cached quotes" in response["status"]["notice"]
+
+    # Without a stale copy of every missing symbol the error goes through
+    with pytest.raises(HTTPException) as e:
+        await service.get_cryptocurrencies(f"{stale},{unknown}")
+    assert e.value.status_code == status
+    await redis_client.disconnect()
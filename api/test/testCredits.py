@@ -0,0 +1,61 @@
+import asyncio
+import pytest
+
+from api.services.credits import CreditScheduler, CreditsExhausted
+
+
+# Scheduler with an in-memory bucket instead of the Redis script
+def local_scheduler(tokens: int, **kwargs) -> CreditScheduler:
+    scheduler = CreditScheduler("test", per_minute=60, **kwargs)
+    bucket = {"tokens": tokens}
+
+    async def take(cost, floor, force=False):
+        if bucket["tokens"] - cost < floor:
+            return False, bucket["tokens"], 50, 0
+        bucket["tokens"] -= cost
+        return True, bucket["tokens"], 0, 0
+
+    scheduler._take = take
+    scheduler.bucket = bucket
+    return scheduler
+
+
+@pytest.mark.asyncio
+async def test_interactive_calls_go_before_background():  # priority queue
+    scheduler = local_scheduler(0, background_reserve=0)
+    order = []
+
+    async def call(name, priority):
+        await scheduler.acquire(1, priority, max_wait=1)
+        order.append(name)
+
+    background = asyncio.create_task(call("background", scheduler.BACKGROUND))
+    await asyncio.sleep(0.01)
+    interactive = asyncio.create_task(call("interactive", scheduler.INTERACTIVE))
+    await asyncio.sleep(0.01)
+    assert scheduler.queue_depth() == {"interactive": 1, "background": 1}
+
+    scheduler.bucket["tokens"] = 1
+    await interactive
+    assert order == ["interactive"]
+    scheduler.bucket["tokens"] = 1
+    await background
+    assert order == ["interactive", "background"]
+
+
+@pytest.mark.asyncio
+async def test_exhausted_budget_fails_within_wait_limit():  # caller can serve stale instead
+    scheduler = local_scheduler(0, interactive_wait=0.01)
+    with pytest.raises(CreditsExhausted) as e:
+        await scheduler.acquire(1)
+    assert e.value.retry_after == 0.05
+    assert scheduler.queue_depth() == {"interactive": 0, "background": 0}
+
+
+@pytest.mark.asyncio
+async def test_background_leaves_reserve_for_interactive():
+    scheduler = local_scheduler(10, background_reserve=0.15, background_wait=0)
+    with pytest.raises(CreditsExhausted):
+        await scheduler.acquire(2, scheduler.BACKGROUND)
+    await scheduler.acquire(2, scheduler.INTERACTIVE)
+    assert scheduler.bucket["tokens"] == 8
@@ -0,0 +1,36 @@
+import pytest
+
+from api.services.crypto_schemes import normalize_quotes, parse_fields, project
+
+UPSTREAM = {
+    "BTC": {
+        "symbol": "BTC",
+        "name": "Bitcoin",
+        "cmc_rank": 1,
+        "tags": ["mineable", "pow"],
+        "quote": {
+            "EUR": {
+                "price": "60000.5",
+                "percent_change_24h": -1.2,
+                "last_updated": "2026-10-18T09:58:00.000Z",
+            }
+        },
+    }
+}
+
+
+def test_normalize_quotes():  # flattened for the convert currency, types checked
+    quote = normalize_quotes(UPSTREAM, "EUR")["BTC"]
+    assert quote["price"] == 60000.5 and quote["convert"] == "EUR"
+    assert quote["last_updated"] == "2026-10-18T09:58:00.000Z"
+    assert "tags" not in quote and quote["market_cap"] is None
+
+
+def test_fields_projection():
+    fields = parse_fields(" price, percent_change_24h,price")
+    assert fields == ("price", "percent_change_24h")
+    quote = normalize_quotes(UPSTREAM, "EUR")["BTC"]
+    assert project(quote, fields) == {"price": 60000.5, "percent_change_24h": -1.2}
+    assert parse_fields("") is None
+    with pytest.raises(ValueError):
+        parse_fields("price,raw")
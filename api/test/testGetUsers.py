@@ -0,0 +1,97 @@
+import json
+import os
+import tempfile
+import uuid
+from datetime import datetime
+
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from api.auth import authRouter
+from api.auth.auth_model import User
+from api.auth.auth_service import _principal_key, create_access_token
+from api.db.db_postgres import Base, get_session
+from api.db.redis import redis_client
+
+
+def test_cursor_round_trip():  # opaque, but decodes to the same keyset position
+    created_at = datetime(2024, 5, 1, 12, 30, 15, 123456)
+    cursor = authRouter.encode_users_cursor(created_at, "abc")
+    assert authRouter.decode_users_cursor(cursor) == (created_at, "abc")
+    for bad in ["not-a-cursor", "bnVsbA==", "WzEsMiwzXQ=="]:
+        with pytest.raises(HTTPException) as e:
+            authRouter.decode_users_cursor(bad)
+        assert e.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_pages_and_stream_cover_every_user(monkeypatch):  # ties on created_at
+    path = os.path.join(tempfile.mkdtemp(), "users.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    # Three users share a timestamp, so page boundaries fall inside the tie
+    same, later = datetime(2024, 1, 1), datetime(2024, 1, 2)
+    users = [
+        User(
+            id=f"id-{i}",
+            username=f"user{i}",
+            email=f"user{i}@example.com",
+            hashed_password="x",
+            created_at=same if i % 2 == 0 else later,
+        )
+        for i in (4, 2, 0, 3, 1)
+    ]
+    async with sessions() as session:
+        session.add_all(users)
+        await session.commit()
+    expected = ["id-0", "id-2", "id-4", "id-1", "id-3"]
+
+    async def get_test_session():
+        async with sessions() as session:
+            yield session
+
+    monkeypatch.setattr(authRouter, "async_session", sessions)
+    app = FastAPI()
+    app.include_router(authRouter.router)
+    app.dependency_overrides[get_session] = get_test_session
+
+    name = f"users-{uuid.uuid4().hex}"
+    await redis_client.cache_json(
+        _principal_key(name), {"id": "1", "username": name, "is_active": True}
+    )
+    token = create_access_token({"sub": name})
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            page = (await client.get("/auth/get-users", params=params)).json()
+            assert len(page["items"]) <= 2
+            seen += [item["id"] for item in page["items"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert seen == expected
+
+        resp = await client.get("/auth/get-users", params={"cursor": "garbage"})
+        assert resp.status_code == 400
+
+        # The full dump needs a token
+        resp = await client.get("/auth/get-users", params={"format": "ndjson"})
+        assert resp.status_code == 401
+        resp = await client.get(
+            "/auth/get-users",
+            params={"format": "ndjson"},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        assert resp.status_code == 200
+        lines = [json.loads(line) for line in resp.text.splitlines()]
+        assert [user["id"] for user in lines] == expected
+
+    await engine.dispose()
+    await redis_client.disconnect()
@@ -0,0 +1,107 @@
+import uuid
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from api.auth.auth_schemes import Principal
+from api.auth.auth_service import get_current_active_user
+from api.db.redis import _envelope, _to_entry, redis_client
+from api.http_cache import cache_headers, cached_json_response
+from api.middleware.compression import CompressionMiddleware, choose_encoding
+from api.routers.weatherRouter import router as weather_router
+from api.services.http_clients import http_clients
+
+
+def test_cache_headers():  # ETag from the content hash, max-age from the soft TTL
+    entry = _to_entry(_envelope({"data": {"temp": 1}}, ttl=900, soft_ttl=300))
+    same = _to_entry(_envelope({"data": {"temp": 1}}, ttl=900, soft_ttl=60))
+    headers = cache_headers([entry])
+    assert headers["ETag"] == f'"{entry.content_hash}"'
+    assert headers["ETag"] == cache_headers([same])["ETag"]
+    assert headers["Cache-Control"] in ("private, max-age=299", "private, max-age=300")
+    assert cache_headers([entry, same], weak=True)["ETag"].startswith('W/"')
+    assert cache_headers([_to_entry({"data": 1})]) is None
+
+
+def test_choose_encoding():
+    assert choose_encoding("gzip, br") == "br"
+    assert choose_encoding("br;q=0, gzip") == "gzip"
+    assert choose_encoding("identity") is None
+
+
+def _app():
+    entry = _to_entry(_envelope({"items": list(range(1000))}, ttl=60, soft_ttl=None))
+
+    async def cached(request: Request):
+        return cached_json_response(request, entry.value, [entry])
+
+    async def events(request: Request):
+        async def stream():
+            for i in range(3):
+                yield f"data: {'x' * 1000}{i}\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    async def small(request: Request):
+        return JSONResponse({"ok": True})
+
+    routes = [
+        Route("/cached", cached),
+        Route("/events", events),
+        Route("/small", small),
+    ]
+    return CompressionMiddleware(Starlette(routes=routes), minimum_size=100)
+
+
+@pytest.mark.asyncio
+async def test_not_modified_and_compression():
+    transport = httpx.ASGITransport(app=_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+        plain = await client.get("/cached", headers={"Accept-Encoding": "identity"})
+        etag = plain.headers["etag"]
+        assert "content-encoding" not in plain.headers
+
+        resp = await client.get("/cached", headers={"Accept-Encoding": "gzip"})
+        assert resp.headers["content-encoding"] == "gzip"
+        assert resp.headers["etag"] == f"W/{etag}"
+        assert resp.json() == plain.json()
+
+        # The weakened ETag of the compressed response still matches
+        for tag in (etag, resp.headers["etag"]):
+            resp = await client.get("/cached", headers={"If-None-Match": tag})
+            assert resp.status_code == 304 and resp.content == b""
+
+        resp = await client.get("/events", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in resp.headers
+        assert resp.text.count("data:") == 3
+        resp = await client.get("/small", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in resp.headers
+
+
+@pytest.mark.asyncio
+async def test_route_keeps_rate_limit_headers():  # on 200 and 304 alike
+    def openweather(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"name": "Oslo", "main": {"temp": 3}})
+
+    http_clients.set_transport("openweather", httpx.MockTransport(openweather))
+    app = FastAPI()
+    app.include_router(weather_router)
+    user = Principal(id="1", username=f"etag-{uuid.uuid4().hex}", is_active=True)
+    app.dependency_overrides[get_current_active_user] = lambda: user
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+        resp = await client.get("/weather/Oslo")
+        assert resp.status_code == 200 and resp.json()["data"]["city"] == "Oslo"
+        assert resp.headers["RateLimit-Remaining"] == "59"
+        resp = await client.get(
+            "/weather/Oslo", headers={"If-None-Match": resp.headers["etag"]}
+        )
+        assert resp.status_code == 304
+        assert resp.headers["RateLimit-Remaining"] == "58"
+    await redis_client.disconnect()
@@ -0,0 +1,39 @@
+import time
+
+from api.db.redis import LocalCache
+
+
+def test_local_cache_lru_eviction():  # least recently used entry goes first
+    cache = LocalCache(max_entries=2, max_bytes=1024, ttl=60)
+    cache.set("a", 1, size=10)
+    cache.set("b", 2, size=10)
+    assert cache.get("a") == 1
+
+    cache.set("c", 3, size=10)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_local_cache_memory_cap():  # total size stays under max_bytes
+    cache = LocalCache(max_entries=100, max_bytes=25, ttl=60)
+    cache.set("a", 1, size=10)
+    cache.set("b", 2, size=10)
+    cache.set("c", 3, size=10)
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 20
+
+    cache.set("huge", 4, size=100)
+    assert cache.get("huge") is None
+
+
+def test_local_cache_expiry():  # entries never outlive the Redis hard expiry
+    cache = LocalCache(ttl=60)
+    cache.set("expired", 1, size=1, expires_at=time.time() - 1)
+    cache.set("short", 2, size=1, expires_at=time.time() + 0.01)
+    assert cache.get("expired") is None
+
+    time.sleep(0.02)
+    assert cache.get("short") is None
+    assert cache.stats()["misses"] == 2
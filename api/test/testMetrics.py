@@ -0,0 +1,44 @@
+import asyncio
+
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+
+from api.db.redis import RedisClient
+from api.metrics import render_metrics
+from api.services.resilience import Upstream
+
+
+def sample(name: str, labels: dict) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_upstream_attempts_are_timed_by_status():  # retries count as attempts
+    labels = {"upstream": "metrics-test", "status": "502"}
+    before = sample("upstream_request_duration_seconds_count", labels)
+    upstream = Upstream("metrics-test", max_retries=1, backoff_base=0.001)
+
+    async def attempt():
+        return httpx.Response(502)
+
+    await upstream.call(attempt)
+    assert sample("upstream_request_duration_seconds_count", labels) == before + 2
+
+
+def test_render_metrics():  # Prometheus text format
+    body, content_type = render_metrics()
+    assert content_type.startswith("text/plain")
+    assert b"cache_operations_total" in body
+
+
+@pytest.mark.asyncio
+async def test_pool_gauge_is_sampled():  # on a timer, not only when scraped
+    client = RedisClient(pool_metrics_interval=0.01)
+    await client.connect()
+    client.start_pool_metrics()
+    await asyncio.sleep(0.05)
+    client.stop_pool_metrics()
+    assert sample("redis_pool_connections", {"state": "idle"}) >= 1
+    assert sample("redis_pool_connections", {"state": "in_use"}) == 0
+    await client.disconnect()
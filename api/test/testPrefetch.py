@@ -0,0 +1,38 @@
+import asyncio
+import uuid
+
+import pytest
+
+from api.db.redis import redis_client
+from api.services.prefetch import Prefetcher
+
+
+def test_record_is_bounded():  # new keys are dropped once max_tracked are pending
+    prefetcher = Prefetcher(enabled=True, max_tracked=2)
+    for key in ["a", "b", "c", "a"]:
+        prefetcher.record("weather", key)
+    assert prefetcher._counts == {("weather", "a"): 2, ("weather", "b"): 1}
+
+
+def test_popularity_decay():  # halves once per half-life
+    prefetcher = Prefetcher(enabled=True, interval=5, half_life=10)
+    assert abs(prefetcher.decay**2 - 0.5) < 1e-9
+    assert not Prefetcher(enabled=False)._counts
+
+
+@pytest.mark.asyncio
+async def test_cold_keys_drop_out():  # decayed below min_score, a key is untracked
+    prefetcher = Prefetcher(enabled=True, interval=5, half_life=5, min_score=0.5)
+    kind = f"test-{uuid.uuid4().hex}"
+    prefetcher.register(kind, lambda keys: asyncio.sleep(0))
+    redis = await redis_client.connect()
+    await redis.zadd(f"popular:{kind}", {"hot": 8, "cold": 1})
+
+    await prefetcher._plan(kind)  # hot 4, cold 0.5
+    assert await redis.zscore(f"popular:{kind}", "cold") == 0.5
+    await prefetcher._plan(kind)  # hot 2, cold 0.25
+    assert await redis.zrange(f"popular:{kind}", 0, -1) == [b"hot"]
+
+    await prefetcher.stop()
+    await redis.delete(f"popular:{kind}")
+    await redis_client.disconnect()
@@ -0,0 +1,79 @@
+import json
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+from api.auth.auth_service import _principal_key, create_access_token
+from api.db.redis import redis_client
+from api.routers.streamRouter import STREAM_RATE_LIMIT, authenticate_ws
+from api.services.coinmarketcap import crypto_service
+from api.services.credits import CreditScheduler
+from api.services.quote_stream import QuoteStream, Subscription
+
+
+def test_slow_subscriber_drops_oldest():  # the queue keeps the latest updates
+    sub = Subscription(maxsize=2)
+    for message in ["a", "b", "c"]:
+        sub.push(message)
+    assert sub.dropped == 1
+    assert [sub.queue.get_nowait() for _ in range(2)] == ["b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_empty_subscription_times_out():
+    assert await Subscription().get(timeout=0.01) is None
+    assert QuoteStream.topic(" btc ", "usd") == "BTC:USD"
+
+
+@pytest.mark.asyncio
+async def test_invalid_symbol_is_isolated(monkeypatch):  # others keep streaming
+    calls = []
+
+    async def get_cryptocurrencies(crypto: str, convert: str = "USD", priority=None):
+        assert priority == CreditScheduler.BACKGROUND
+        calls.append(crypto)
+        if "BOGUS" in crypto.split(","):
+            raise HTTPException(status_code=400, detail="Invalid value for symbol")
+        return {"data": {s: {"symbol": s} for s in crypto.split(",")}}
+
+    monkeypatch.setattr(crypto_service, "get_cryptocurrencies", get_cryptocurrencies)
+    stream = QuoteStream()
+    quotes = await stream._fetch(["BTC", "BOGUS", "ETH"], "USD")
+    assert set(quotes) == {"BTC", "ETH"}
+    assert calls == ["BTC,BOGUS,ETH", "BTC", "BOGUS", "ETH"]
+    assert list(stream._rejected) == ["BOGUS:USD"]
+
+
+class FakeWebSocket:
+    def __init__(self, *messages):
+        self.messages = list(messages)
+
+    async def receive_text(self):
+        return self.messages.pop(0)
+
+
+@pytest.mark.asyncio
+async def test_websocket_auth_message():  # the token comes in the first message
+    name = f"ws-{uuid.uuid4().hex}"
+    await redis_client.cache_json(
+        _principal_key(name), {"id": "1", "username": name, "is_active": True}
+    )
+    token = create_access_token({"sub": name})
+
+    auth = json.dumps({"action": "auth", "token": token})
+    user = await authenticate_ws(FakeWebSocket(auth))
+    assert user.username == name
+
+    with pytest.raises(ValueError):
+        await authenticate_ws(FakeWebSocket(json.dumps({"action": "subscribe"})))
+    with pytest.raises(HTTPException) as e:
+        await authenticate_ws(FakeWebSocket(json.dumps({"action": "auth"})))
+    assert e.value.status_code == 401
+
+    # SSE and WebSocket connections share the per-user limit
+    with pytest.raises(HTTPException) as e:
+        for _ in range(int(STREAM_RATE_LIMIT.split("/")[0])):
+            await authenticate_ws(FakeWebSocket(auth))
+    assert e.value.status_code == 429
+    await redis_client.disconnect()
@@ -0,0 +1,40 @@
+import uuid
+
+import pytest
+from fastapi import HTTPException, Response
+
+from api.db.redis import redis_client
+from api.services.rate_limit import RateLimit, parse_rate
+
+
+def test_parse_rate():  # "<count>/<period>" with a named period
+    assert parse_rate("60/minute") == (60, 60.0)
+    assert parse_rate("1000/day") == (1000, 86400.0)
+    with pytest.raises(ValueError):
+        parse_rate("60/fortnight")
+
+
+def test_rate_limit_spacing():  # GCRA spaces requests evenly across the period
+    limit = RateLimit("test", "30/minute")
+    assert limit.limit == 30
+    assert limit.interval_ms == 2000
+    assert not RateLimit("test", "0/minute").enabled
+
+
+@pytest.mark.asyncio
+async def test_gcra_burst_then_429():  # the script allows `limit` at once, then spaces
+    limit = RateLimit("test", "5/minute", enabled=True)
+    key = f"ip:{uuid.uuid4().hex}"
+    remaining = []
+    for _ in range(5):
+        response = Response()
+        await limit.check(key, response)
+        remaining.append(response.headers["RateLimit-Remaining"])
+    assert remaining == ["4", "3", "2", "1", "0"]
+
+    with pytest.raises(HTTPException) as e:
+        await limit.check(key, Response())
+    assert e.value.status_code == 429
+    assert e.value.headers["Retry-After"] == "12"
+    assert e.value.headers["RateLimit-Remaining"] == "0"
+    await redis_client.disconnect()
@@ -1,7 +1,8 @@
 import logging
 import pytest
 
-from api.db.redis import redis_client
+from api.db.redis import RedisClient, redis_client
+from api.routers import statusRouter
 
 
 @pytest.mark.asyncio
@@ -21,3 +22,23 @@ async def test_redis():  # test basic Redis operations
 
     await redis_client.disconnect()
     logging.log(logging.INFO, "Disconnected from Redis")
+
+
+@pytest.mark.asyncio
+async def test_pool_stats():  # from the pool's public connection counts
+    redis = await redis_client.connect()
+    await redis.ping()
+    stats = redis_client.pool_stats()
+    assert stats["max_connections"] == redis_client.max_connections
+    assert stats["in_use"] == 0 and stats["idle"] >= 1
+    await redis_client.disconnect()
+
+
+@pytest.mark.asyncio
+async def test_status_shows_l1_stats(monkeypatch):  # null while L1 is disabled
+    client = RedisClient(l1_enabled=True)
+    monkeypatch.setattr(statusRouter, "redis_client", client)
+    client.l1.get("missing")
+    status = await statusRouter.get_redis()
+    assert status["l1"]["misses"] == 1 and status["in_use"] == 0
+    assert RedisClient(l1_enabled=False).l1_stats() is None
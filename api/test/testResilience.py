@@ -0,0 +1,92 @@
+import asyncio
+import httpx
+import pytest
+
+from api.services.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryBudget,
+    Upstream,
+)
+
+
+def test_circuit_breaker_opens_and_recovers():  # closed -> open -> half-open -> closed
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.01)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    asyncio.run(asyncio.sleep(0.02))
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()  # one trial call at a time
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_retry_budget_limits_retries():  # retries can't outgrow the ratio
+    budget = RetryBudget(ratio=0.5, min_per_second=0)
+    budget.tokens = 0
+    assert not budget.withdraw()
+    budget.deposit()
+    budget.deposit()
+    assert budget.withdraw()
+    assert not budget.withdraw()
+
+
+@pytest.mark.asyncio
+async def test_upstream_retries_then_fails_fast():  # 5xx is retried, then the breaker opens
+    upstream = Upstream("test", failure_threshold=3, max_retries=1, backoff_base=0.001)
+    calls = 0
+
+    async def attempt():
+        nonlocal calls
+        calls += 1
+        return httpx.Response(503)
+
+    assert (await upstream.call(attempt)).status_code == 503
+    assert calls == 2
+    assert (await upstream.call(attempt)).status_code == 503
+    with pytest.raises(CircuitOpenError):
+        await upstream.call(attempt)
+    assert calls == 3
+
+
+@pytest.mark.asyncio
+async def test_upstream_hedges_slow_attempts():  # the hedge answers first
+    upstream = Upstream("test", hedge_percentile=50, hedge_min_samples=1)
+    upstream._latencies.append(0.01)
+    delays = [1.0, 0.0]
+
+    async def attempt():
+        await asyncio.sleep(delays.pop(0))
+        return httpx.Response(200)
+
+    resp = await asyncio.wait_for(upstream.call(attempt), timeout=0.5)
+    assert resp.status_code == 200
+    assert upstream.hedges == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_trial_reopens_breaker():  # a timed-out trial can't wedge it
+    upstream = Upstream("test-cancel", failure_threshold=1, reset_timeout=0.01)
+    upstream.breaker.record_failure()
+    await asyncio.sleep(0.02)
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(upstream.call(hang), 0.01)
+    assert upstream.breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError) as e:
+        await upstream.call(hang)
+    assert e.value.retry_after > 0
+
+    await asyncio.sleep(0.02)
+    resp = await upstream.call(lambda: asyncio.sleep(0, httpx.Response(200)))
+    assert resp.status_code == 200
+    assert upstream.breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,39 @@
+import asyncio
+import pytest
+
+from api.services.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_concurrent_calls():  # one fetch for many waiters
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"data": "ok"}
+
+    flight = SingleFlight()
+    results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(50)))
+
+    assert calls == 1
+    assert all(result == {"data": "ok"} for result in results)
+
+    # Once the call has finished, the next miss triggers a new fetch
+    await flight.do("key", fetch)
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_errors():  # every waiter sees the failure
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream failed")
+
+    flight = SingleFlight()
+    results = await asyncio.gather(
+        *(flight.do("key", fetch) for _ in range(5)), return_exceptions=True
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
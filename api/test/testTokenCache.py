@@ -0,0 +1,45 @@
+import time
+
+import pytest
+
+from api.auth.token_cache import VerifiedTokenCache
+from api.routers.statusRouter import get_token_cache
+
+
+def test_token_cache_hit_and_miss():  # repeat lookups skip verification
+    cache = VerifiedTokenCache(max_size=10)
+    assert cache.get("token") is None
+
+    cache.put("token", {"sub": "alice", "exp": time.time() + 60})
+    assert cache.get("token")["sub"] == "alice"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_token_cache_rejects_expired():  # expired tokens go back to the JWT library
+    cache = VerifiedTokenCache(max_size=10)
+    cache.put("token", {"sub": "alice", "exp": time.time() - 1})
+    assert cache.get("token") is None
+    assert cache.stats()["size"] == 0
+
+    cache.put("no-exp", {"sub": "alice"})
+    assert cache.get("no-exp") is None
+
+
+def test_token_cache_size_cap():  # least recently used token is evicted
+    cache = VerifiedTokenCache(max_size=2)
+    exp = time.time() + 60
+    cache.put("a", {"sub": "a", "exp": exp})
+    cache.put("b", {"sub": "b", "exp": exp})
+    cache.get("a")
+    cache.put("c", {"sub": "c", "exp": exp})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_token_cache_status():  # counters of the shared cache at /status
+    stats = await get_token_cache()
+    assert {"hits", "misses", "evictions", "size", "hit_rate"} <= set(stats)
@@ -0,0 +1,101 @@
+import asyncio
+import uuid
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from api.db.redis import redis_client
+from api.services.http_clients import http_clients
+from api.services.weatherService import WeatherClient, canonical_city
+
+
+def test_canonical_city():  # case, whitespace and Unicode forms share a key
+    assert canonical_city("  New\tYork ") == "new york"
+    assert canonical_city("ＭＯＳＣＯＷ") == canonical_city("moscow")
+
+
+@pytest.mark.asyncio
+async def test_unknown_city_is_cached():  # one upstream call per TTL for a 404
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.params.get("q") or request.url.params.get("id"))
+        if request.url.params.get("q") == "nowhere-test":
+            return httpx.Response(404, json={"cod": "404"})
+        return httpx.Response(200, json={"id": 524901, "name": "Moscow", "dt": 1})
+
+    client = WeatherClient(city_aliases=True)
+    http_clients.set_transport("openweather", httpx.MockTransport(handler))
+    redis = await redis_client.connect()
+    await redis.delete(
+        "weather:nowhere-test:metric:ru",
+        "weather:alias:moscow",
+        "weather:alias:москва-test",
+        "weather:id:524901:metric:ru",
+    )
+
+    for _ in range(2):
+        with pytest.raises(HTTPException) as e:
+            await client.current_weather("Nowhere-Test")
+        assert e.value.status_code == 404
+    assert calls == ["nowhere-test"]
+
+    # Both spellings resolve to city 524901 and share its entry
+    first = await client.current_weather(" Moscow")
+    second = await client.current_weather("MOSCOW ")
+    assert first == second and calls == ["nowhere-test", "moscow"]
+    assert await redis_client.get("weather:alias:moscow") == "524901"
+    await client.current_weather("Москва-test")
+    assert await client._resolve("москва-test") == "id:524901"
+    await redis_client.disconnect()
+
+
+@pytest.mark.asyncio
+async def test_soft_expired_served_stale_with_one_refresh():  # requests don't wait
+    calls = []
+    release = asyncio.Event()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.params["q"])
+        await release.wait()
+        return httpx.Response(200, json={"name": "Stale", "main": {"temp": 2}})
+
+    client = WeatherClient()
+    http_clients.set_transport("openweather", httpx.MockTransport(handler))
+    city = f"stale-{uuid.uuid4().hex}"
+    key = client.cache_key(city, "metric", "ru")
+    await redis_client.cache_json(key, {"data": {"temp": 1}}, ttl=60, soft_ttl=0)
+
+    served = await asyncio.gather(*(client.current_weather(city) for _ in range(3)))
+    assert [s["data"]["temp"] for s in served] == [1, 1, 1]
+    await asyncio.sleep(0.01)
+    assert len(client._background) == 3 and calls == [city]
+
+    release.set()
+    await asyncio.gather(*client._background)
+    assert calls == [city]
+    entry = await redis_client.get_json_entry(key)
+    assert entry.value["data"]["temp"] == 2 and not entry.stale
+    await redis_client.disconnect()
+
+
+@pytest.mark.asyncio
+async def test_hard_expired_is_fetched_synchronously():  # nothing left to serve
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.params["q"])
+        return httpx.Response(200, json={"name": "Gone", "main": {"temp": 5}})
+
+    client = WeatherClient()
+    http_clients.set_transport("openweather", httpx.MockTransport(handler))
+    city = f"gone-{uuid.uuid4().hex}"
+    key = client.cache_key(city, "metric", "ru")
+    await redis_client.cache_json(key, {"data": {"temp": 1}}, ttl=1, soft_ttl=0)
+    await asyncio.sleep(1.1)
+
+    weather = await client.current_weather(city)
+    assert weather["data"]["temp"] == 5 and calls == [city]
+    assert not client._background
+    await redis_client.disconnect()
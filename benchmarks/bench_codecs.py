@@ -0,0 +1,88 @@
+"""Encode/decode time and stored bytes of cached payloads per codec.
+
+Runs every available codec/compression combination of PayloadCodec over the
+cache envelopes RedisClient stores for real weather and crypto responses.
+
+    python -m benchmarks.bench_codecs --iterations 2000
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+from api.db.codecs import COMPRESSORS, CODECS, PayloadCodec
+from api.db.redis import _envelope
+
+PAYLOADS = Path(__file__).parent / "payloads"
+
+
+# What the services actually cache for each sample response
+def sample_payloads() -> dict[str, dict]:
+    weather = json.loads((PAYLOADS / "openweather_current.json").read_text())
+    crypto = json.loads((PAYLOADS / "coinmarketcap_quotes.json").read_text())
+    normalized_weather = {
+        "data": {
+            "city": weather["name"],
+            "temp": weather["main"]["temp"],
+            "feels_like": weather["main"]["feels_like"],
+            "humidity": weather["main"]["humidity"],
+            "weather": weather["weather"][0]["description"],
+            "wind_speed": weather["wind"]["speed"],
+            "dt": weather["dt"],
+        }
+    }
+    return {
+        "weather_normalized": _envelope(normalized_weather, 900, 300),
+        "crypto_quote": _envelope(crypto["data"]["BTC"], 60, None),
+        "crypto_response": _envelope(crypto, 60, None),
+    }
+
+
+def measure(codec: PayloadCodec, payload: dict, iterations: int) -> dict:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        encoded = codec.encode(payload)
+    encode_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        codec.decode(encoded)
+    decode_time = time.perf_counter() - start
+
+    return {
+        "bytes": len(encoded),
+        "encode_us": round(encode_time / iterations * 1e6, 2),
+        "decode_us": round(decode_time / iterations * 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--min-size", type=int, default=1024)
+    args = parser.parse_args()
+
+    results = []
+    for codec_name in CODECS:
+        for compression in ["none", *COMPRESSORS]:
+            try:
+                codec = PayloadCodec(codec_name, compression, args.min_size)
+            except RuntimeError as e:
+                print(f"skipping {codec_name}+{compression}: {e}", file=sys.stderr)
+                continue
+            for payload_name, payload in sample_payloads().items():
+                results.append(
+                    {
+                        "codec": codec_name,
+                        "compression": compression,
+                        "payload": payload_name,
+                        **measure(codec, payload, args.iterations),
+                    }
+                )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
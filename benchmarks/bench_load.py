@@ -0,0 +1,200 @@
+"""Offline load test of the API against local upstream stand-ins.
+
+Runs the application in-process with fake OpenWeather and CoinMarketCap
+apps (benchmarks/fake_upstreams.py), fakeredis (or a real Redis given with
+--redis) and a throwaway SQLite database. Each scenario is driven at every
+concurrency level, starting from an empty cache, and reported as JSON:
+throughput, p50/p95/p99 latency, response statuses and upstream calls.
+
+    python -m benchmarks.bench_load --concurrency 1 10 50 --requests 500 \\
+        --upstream-latency-ms 50 --error-rate 0.01 > results.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+
+# Everything is local: no credentials, no limits between us and the app, and no
+# background prefetch calls mixed into the upstream call counts
+DB_FILE = os.path.join(tempfile.mkdtemp(prefix="bench_load_"), "bench.db")
+os.environ.update(
+    {
+        "SECRET_KEY_FOR_JWT": "benchmark",
+        "API_KEY": "benchmark",
+        "COINMARKETCAP_API_KEY": "benchmark",
+        "DATABASE_URL": f"sqlite+aiosqlite:///{DB_FILE}",
+        "DB_ECHO": "false",
+        "UPSTREAM_WARMUP": "false",
+        "RATE_LIMIT_ENABLED": "false",
+        "CMC_CREDITS_PER_MINUTE": "0",
+        "CMC_CREDITS_PER_DAY": "0",
+        "ACCESS_LOG_SAMPLE_RATE": "0",
+        "PREFETCH_ENABLED": "false",
+    }
+)
+
+import httpx  # noqa: E402
+
+from api.db.db_postgres import Base, engine  # noqa: E402
+from api.db.redis import redis_client  # noqa: E402
+from api.services.http_clients import http_clients  # noqa: E402
+from benchmarks.fake_upstreams import FakeCoinMarketCap, FakeOpenWeather  # noqa: E402
+from main import app, lifespan  # noqa: E402
+
+SCENARIOS = ["weather", "crypto", "login", "register"]
+CITIES = [f"City{i}" for i in range(20)]
+SYMBOLS = ["BTC", "ETH", "USDT", "BNB", "SOL", "USDC", "XRP", "DOGE", "TON", "ADA"]
+PASSWORD = "benchmark-password"
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+# Request number i of a scenario, as (method, url, kwargs)
+def build_request(scenario: str, i: int, token: str, run_id: str):
+    auth = {"Authorization": f"Bearer {token}"}
+    if scenario == "weather":
+        return "GET", f"/weather/{CITIES[i % len(CITIES)]}", {"headers": auth}
+    if scenario == "crypto":
+        symbols = ",".join(SYMBOLS[j % len(SYMBOLS)] for j in range(i % 3, i % 3 + 3))
+        return "GET", "/crypto/", {"params": {"currency": symbols}, "headers": auth}
+    if scenario == "login":
+        data = {"username": "bench", "password": PASSWORD}
+        return "POST", "/auth/token", {"data": data}
+    if scenario == "register":
+        name = f"bench-{run_id}-{i}"
+        user = {"username": name, "email": f"{name}@example.com", "password": PASSWORD}
+        return "POST", "/auth/register", {"json": user}
+    raise ValueError(scenario)
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    scenario: str,
+    concurrency: int,
+    requests: int,
+    token: str,
+    upstreams: dict,
+) -> dict:
+    await (await redis_client.connect()).flushall()
+    calls_before = {name: sum(u.calls.values()) for name, u in upstreams.items()}
+    run_id = uuid.uuid4().hex[:8]
+    latencies: list[float] = []
+    statuses: Counter[int] = Counter()
+    next_request = iter(range(requests))
+
+    async def worker():
+        for i in next_request:
+            method, url, kwargs = build_request(scenario, i, token, run_id)
+            start = time.perf_counter()
+            resp = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            statuses[resp.status_code] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": requests,
+        "seconds": round(elapsed, 3),
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "statuses": {str(code): n for code, n in sorted(statuses.items())},
+        "upstream_calls": {
+            name: sum(u.calls.values()) - calls_before[name]
+            for name, u in upstreams.items()
+        },
+    }
+
+
+# Local Redis stand-in, unless a real one is given as host:port
+async def setup_redis(address: str | None):
+    if address:
+        host, _, port = address.partition(":")
+        redis_client.host, redis_client.port = host, int(port or 6379)
+        return
+    try:
+        from fakeredis import FakeAsyncRedis
+    except ImportError:
+        sys.exit("fakeredis is not installed, install it or pass --redis host:port")
+    redis_client.connection = FakeAsyncRedis()
+
+
+async def main_async(args):
+    upstream_options = {
+        "latency_ms": args.upstream_latency_ms,
+        "jitter_ms": args.upstream_jitter_ms,
+        "error_rate": args.error_rate,
+    }
+    upstreams = {
+        "openweather": FakeOpenWeather(**upstream_options),
+        "coinmarketcap": FakeCoinMarketCap(**upstream_options),
+    }
+    for name, upstream in upstreams.items():
+        http_clients.set_transport(name, upstream.transport())
+    await setup_redis(args.redis)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with lifespan(app), httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=60
+    ) as client:
+        user = {"username": "bench", "email": "bench@example.com", "password": PASSWORD}
+        await client.post("/auth/register", json=user)
+        resp = await client.post(
+            "/auth/token", data={"username": "bench", "password": PASSWORD}
+        )
+        token = resp.json()["access_token"]
+
+        for scenario in args.scenarios:
+            for concurrency in args.concurrency:
+                results.append(
+                    await run_level(
+                        client,
+                        scenario,
+                        concurrency,
+                        args.requests,
+                        token,
+                        upstreams,
+                    )
+                )
+    await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 10, 50])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--upstream-latency-ms", type=float, default=20)
+    parser.add_argument("--upstream-jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--redis", help="host:port of a real Redis, fakeredis if unset")
+    args = parser.parse_args()
+
+    # Per-request client logs would be part of what is measured
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    results = asyncio.run(main_async(args))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Event-loop latency under a login storm, bcrypt inline vs. on PasswordHasher.
+
+A ticker coroutine measures how late the event loop wakes it up while
+`--logins` concurrent password verifications run. Inline verification blocks
+the loop for the whole bcrypt call; the pool keeps the loop responsive.
+
+    python -m benchmarks.bench_password_hashing --logins 50 --workers 4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+os.environ.setdefault("SECRET_KEY_FOR_JWT", "benchmark")
+
+from api.auth.auth_service import (  # noqa: E402
+    PasswordHasher,
+    get_password_hash,
+    verify_password,
+)
+
+TICK = 0.005
+
+
+# Records how late each TICK-second sleep wakes up until stopped
+async def measure_lag(stop: asyncio.Event) -> list[float]:
+    lags = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+    return lags
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(mode: str, logins: int, hashed: str, hasher: PasswordHasher) -> dict:
+    async def inline_login():
+        verify_password("benchmark-password", hashed)
+
+    async def pooled_login():
+        await hasher.verify("benchmark-password", hashed)
+
+    login = inline_login if mode == "inline" else pooled_login
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(measure_lag(stop))
+    await asyncio.sleep(TICK * 2)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    lags = await ticker
+    return {
+        "mode": mode,
+        "logins": logins,
+        "elapsed_s": round(elapsed, 3),
+        "loop_lag_ms": {
+            "p50": round(statistics.median(lags) * 1000, 2),
+            "p99": round(percentile(lags, 99) * 1000, 2),
+            "max": round(max(lags) * 1000, 2),
+        },
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    hashed = get_password_hash("benchmark-password")
+    hasher = PasswordHasher(workers=args.workers, max_queue=args.logins)
+    results = [
+        await run("inline", args.logins, hashed, hasher),
+        await run("pool", args.logins, hashed, hasher),
+    ]
+    hasher.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+"""Local ASGI stand-ins for OpenWeather and CoinMarketCap.
+
+Both answer from the recorded payloads in benchmarks/payloads after an
+optional latency, fail a share of calls with 500 and count the calls they
+received. Route an upstream to one with http_clients.set_transport.
+"""
+
+import asyncio
+import copy
+import json
+import random
+from collections import Counter
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+PAYLOADS = Path(__file__).parent / "payloads"
+
+
+# Latency and error injection shared by the fake upstreams
+class FakeUpstream:
+    def __init__(
+        self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.calls: Counter[str] = Counter()
+        self.app = FastAPI()
+
+    async def delay(self, path: str) -> JSONResponse | None:
+        self.calls[path] += 1
+        latency = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if latency > 0:
+            await asyncio.sleep(latency / 1000)
+        if random.random() < self.error_rate:
+            return JSONResponse({"message": "injected failure"}, status_code=500)
+        return None
+
+    def transport(self) -> httpx.ASGITransport:
+        return httpx.ASGITransport(app=self.app)
+
+
+# GET /data/2.5/weather?q=<city> or ?id=<city id>. Every city gets an id on its
+# first lookup by name; names starting with "nowhere" (any case) and ids never
+# handed out are unknown (404).
+class FakeOpenWeather(FakeUpstream):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.payload = json.loads((PAYLOADS / "openweather_current.json").read_text())
+        self.city_ids: dict[str, int] = {}
+        self.app.add_api_route("/data/2.5/weather", self.weather)
+
+    async def weather(self, q: str | None = None, id: int | None = None):
+        failure = await self.delay("weather")
+        if failure is not None:
+            return failure
+        if q is not None and not q.lower().startswith("nowhere"):
+            city_id = self.city_ids.setdefault(q, len(self.city_ids) + 1)
+            return {**self.payload, "id": city_id, "name": q}
+        names = {city_id: name for name, city_id in self.city_ids.items()}
+        if id in names:
+            return {**self.payload, "id": id, "name": names[id]}
+        return JSONResponse({"cod": "404", "message": "city not found"}, 404)
+
+
+# GET /v1/cryptocurrency/quotes/latest?symbol=A,B&convert=X
+class FakeCoinMarketCap(FakeUpstream):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.payload = json.loads((PAYLOADS / "coinmarketcap_quotes.json").read_text())
+        self.app.add_api_route("/v1/cryptocurrency/quotes/latest", self.quotes)
+
+    async def quotes(self, symbol: str, convert: str = "USD"):
+        failure = await self.delay("quotes/latest")
+        if failure is not None:
+            return failure
+        template = self.payload["data"]["BTC"]
+        data = {}
+        for s in symbol.split(","):
+            quote = copy.deepcopy(self.payload["data"].get(s, template))
+            quote["symbol"] = s
+            quote["quote"] = {convert: next(iter(quote["quote"].values()))}
+            data[s] = quote
+        status = {**self.payload["status"], "credit_count": 1 + len(data) // 100}
+        return {"status": status, "data": data}
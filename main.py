@@ -1,37 +1,59 @@
 import logging
-import time
-from typing import Callable
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI
 from api.routers.weatherRouter import router as weatherRouter
 from api.routers.cryptoRouter import router as cryptoRouter
 from api.auth.authRouter import router as authRouter
-
-# Setting up logging
-logging.basicConfig(level=logging.INFO)
+from api.routers.aggregateRouter import router as aggregateRouter
+from api.routers.statusRouter import router as statusRouter
+from api.routers.metricsRouter import router as metricsRouter
+from api.routers.streamRouter import router as streamRouter
+from api.db.redis import redis_client
+from api.middleware.access_log import AccessLogMiddleware, QueueLogging
+from api.metrics import mark_process_dead
+from api.middleware.compression import CompressionMiddleware
+from api.services.http_clients import http_clients
+from api.services.prefetch import prefetcher
+from api.services.quote_stream import quote_stream
+
+# Setting up logging, records are written by a background thread
+queue_logging = QueueLogging(level=logging.INFO)
+queue_logging.start()
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="API Agregator")
-
 
-# Unified middleware for logging and timing
-@app.middleware("http")
-async def unified_middleware(request: Request, call_next: Callable):
-    # Log incoming request headers
-    logger.info(f"Incoming request headers: {request.headers}")
+# Open (and warm up) shared upstream clients on startup, close everything on shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    queue_logging.start()
+    await http_clients.startup()
+    await prefetcher.start()
+    redis_client.start_pool_metrics()
+    yield
+    redis_client.stop_pool_metrics()
+    await prefetcher.stop()
+    await quote_stream.stop()
+    await http_clients.shutdown()
+    await redis_client.disconnect()
+    mark_process_dead()
+    queue_logging.stop()
 
-    # Setting a start time to measure response time
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    logger.info(f"The response time is {process_time:.4f} seconds")
 
-    return response
+app = FastAPI(title="API Agregator", lifespan=lifespan)
 
+# gzip/brotli for large responses, inside the access log so its timing includes it
+app.add_middleware(CompressionMiddleware)
+# Access log and timing of every request
+app.add_middleware(AccessLogMiddleware)
 
 app.include_router(weatherRouter)
 app.include_router(cryptoRouter)
 app.include_router(authRouter)
+app.include_router(aggregateRouter)
+app.include_router(statusRouter)
+app.include_router(metricsRouter)
+app.include_router(streamRouter)
 
 
 # Run the application